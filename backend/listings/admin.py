@@ -1,9 +1,24 @@
 from django.contrib import admin
-from .models import Listing
+from .models import Listing, NeighborhoodStats, SyncCursor, GeocodeCache
 
 @admin.register(Listing)
 class ListingAdmin(admin.ModelAdmin):
     list_display = ['title', 'price', 'location', 'scraped_at']
     list_filter = ['location', 'active']
     search_fields = ['title', 'craigslist_id', 'location']
-    readonly_fields = ['scraped_at']
\ No newline at end of file
+    readonly_fields = ['scraped_at', 'updated_at']
+
+@admin.register(NeighborhoodStats)
+class NeighborhoodStatsAdmin(admin.ModelAdmin):
+    list_display = ['location', 'listing_count', 'min_price', 'max_price']
+    search_fields = ['location']
+
+
+@admin.register(SyncCursor)
+class SyncCursorAdmin(admin.ModelAdmin):
+    list_display = ['target', 'synced_until', 'last_synced_at']
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ['address', 'latitude', 'longitude', 'fetched_at']
+    search_fields = ['address']
@@ -1,45 +1,83 @@
-from django.db.models import Avg, Count, Min, Max
-from .models import Listing
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg, Count, Q
+from .models import Listing, NeighborhoodStats
+from .cache import get_or_compute
+
+# consecutive edges make the buckets, e.g. [1, 1500) [1500, 2000) ...
+# override with PRICE_DISTRIBUTION_EDGES in settings
+PRICE_DISTRIBUTION_EDGES = [1, 1500, 2000, 2500, 3000, 3500, 4000, 5000, 10000]
+
+# fields the distribution can be split by
+DISTRIBUTION_SEGMENTS = ['location', 'bedrooms']
 
 def get_neighborhood_stats():
-    stats = Listing.objects.filter(
-        active=True,
-        bedrooms__isnull=False
-    ).values('location').annotate(
-        avg_price=Avg('price'),
-        median_bedrooms=Avg('bedrooms'),
-        listing_count=Count('id'),
-        min_price=Min('price'),
-        max_price=Max('price'),
-        avg_sqft=Avg('sqft')
+    return get_or_compute('listings:neighborhood_stats', compute_neighborhood_stats)
+
+def compute_neighborhood_stats():
+    # reads the running totals in NeighborhoodStats instead of aggregating listings
+    stats = NeighborhoodStats.objects.filter(
+        listing_count__gt=0
     ).order_by('-listing_count')
 
-    return list(stats)
-
-def get_price_distribution():
-    buckets = [
-        (1, 1500),
-        (1500, 2000),
-        (2000, 2500),
-        (2500, 3000),
-        (3500, 4000),
-        (4000, 5000),
-        (5000, 10000),
+    return [
+        {
+            'location': stat.location,
+            'avg_price': stat.avg_price,
+            'median_bedrooms': stat.median_bedrooms,
+            'listing_count': stat.listing_count,
+            'min_price': stat.min_price,
+            'max_price': stat.max_price,
+            'avg_sqft': stat.avg_sqft,
+        }
+        for stat in stats
     ]
-    
-    distribution = []
-    for min_price, max_price in buckets:
-        count = Listing.objects.filter(
-            active=True,
-            price__gte=min_price,
-            price__lt=max_price
-        ).count()
-
-        distribution.append({
+
+def get_price_buckets(edges=None):
+    if edges is None:
+        edges = getattr(settings, 'PRICE_DISTRIBUTION_EDGES', PRICE_DISTRIBUTION_EDGES)
+
+    return list(zip(edges, edges[1:]))
+
+def format_distribution(buckets, counts):
+    return [
+        {
             'range': f'${min_price}-${max_price}',
-            'count': count
-        })
-    return distribution
+            'count': counts[f'bucket_{index}'],
+        }
+        for index, (min_price, max_price) in enumerate(buckets)
+    ]
+
+def get_price_distribution(edges=None, segment_by=None):
+    """
+    all bucket counts come from one query with a filtered COUNT per bucket
+    segment_by ('location' or 'bedrooms') returns one histogram per segment,
+    still in a single GROUP BY query
+    """
+    buckets = get_price_buckets(edges)
+
+    bucket_counts = {
+        f'bucket_{index}': Count('id', filter=Q(price__gte=min_price, price__lt=max_price))
+        for index, (min_price, max_price) in enumerate(buckets)
+    }
+
+    listings = Listing.objects.filter(active=True)
+
+    if segment_by is None:
+        return format_distribution(buckets, listings.aggregate(**bucket_counts))
+
+    if segment_by not in DISTRIBUTION_SEGMENTS:
+        raise ValueError(f'Cannot segment price distribution by {segment_by}')
+
+    rows = listings.values(segment_by).annotate(**bucket_counts).order_by(segment_by)
+
+    return [
+        {
+            segment_by: row[segment_by],
+            'distribution': format_distribution(buckets, row),
+        }
+        for row in rows
+    ]
 
 def get_overall_stats():
     listings = Listing.objects.filter(
@@ -61,4 +99,78 @@ def get_overall_stats():
         ).count(),
     }
 
-    return stats
\ No newline at end of file
+    return stats
+
+
+# the *_from_columns versions build the same sections from columns that were
+# already loaded by load_columns(), so the analytics endpoint can scan once
+
+def overall_stats_from_columns(columns):
+    price = columns['price']
+    bedrooms = columns['bedrooms']
+    has_bedrooms = ~np.isnan(bedrooms)
+
+    avg_price = price.sum() / len(price) if len(price) else 0
+    median_bedrooms = bedrooms[has_bedrooms].sum() / has_bedrooms.sum() if has_bedrooms.any() else 0
+
+    return {
+        'total_listings': len(price),
+        'avg_price': round(float(avg_price), 2),
+        'median_bedrooms': round(float(median_bedrooms), 1),
+        'locations_count': len(set(columns['location'])),
+        'with_details': int(columns['has_details'].astype(bool).sum()),
+    }
+
+def neighborhood_stats_from_columns(columns):
+    has_bedrooms = ~np.isnan(columns['bedrooms'])
+    locations = columns['location'][has_bedrooms]
+
+    if not len(locations):
+        return []
+
+    price = columns['price'][has_bedrooms]
+    bedrooms = columns['bedrooms'][has_bedrooms]
+    sqft = columns['sqft'][has_bedrooms]
+
+    names, inverse = np.unique(locations.astype(str), return_inverse=True)
+    size = len(names)
+
+    counts = np.bincount(inverse, minlength=size)
+    price_sums = np.bincount(inverse, weights=price, minlength=size)
+    bedroom_sums = np.bincount(inverse, weights=bedrooms, minlength=size)
+
+    has_sqft = ~np.isnan(sqft)
+    sqft_counts = np.bincount(inverse[has_sqft], minlength=size)
+    sqft_sums = np.bincount(inverse[has_sqft], weights=sqft[has_sqft], minlength=size)
+
+    min_prices = np.full(size, np.inf)
+    max_prices = np.full(size, -np.inf)
+    np.minimum.at(min_prices, inverse, price)
+    np.maximum.at(max_prices, inverse, price)
+
+    stats = []
+    for index, location in enumerate(names):
+        stats.append({
+            'location': str(location),
+            'avg_price': float(price_sums[index] / counts[index]),
+            'median_bedrooms': float(bedroom_sums[index] / counts[index]),
+            'listing_count': int(counts[index]),
+            'min_price': int(min_prices[index]),
+            'max_price': int(max_prices[index]),
+            'avg_sqft': float(sqft_sums[index] / sqft_counts[index]) if sqft_counts[index] else None,
+        })
+
+    stats.sort(key=lambda stat: stat['listing_count'], reverse=True)
+
+    return stats
+
+def price_distribution_from_columns(columns, edges=None):
+    price = columns['price']
+    buckets = get_price_buckets(edges)
+
+    counts = {
+        f'bucket_{index}': int(((price >= min_price) & (price < max_price)).sum())
+        for index, (min_price, max_price) in enumerate(buckets)
+    }
+
+    return format_distribution(buckets, counts)
@@ -0,0 +1,197 @@
+import asyncio, random
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from listings.scraper import SEARCH_URL, HEADERS, parse_search_results
+from listings.detail_scraper import parse_listing_details
+from listings.geocoding import (
+    TOMTOM_API_KEY, normalize_address, geocode_url, parse_geocode_response,
+    geocode_cache_key, get_cached_geocode, store_geocode,
+)
+from listings.local_geocoder import local_geocode
+from listings.throttle import AsyncRateLimiter
+from listings.http_client import RETRY_STATUSES
+from listings.ingest import save_batch
+
+# asyncio version of scrape_list_urls, one process runs four stages
+#   search page -> detail workers -> geocode workers -> batch saver
+# connected by bounded queues, so a slow stage pushes back on the one before it
+# BeautifulSoup parsing is reused as is and runs in the default executor
+
+DONE = None
+
+async def fetch(client, url, limiter):
+    # same retry policy as http_client: 429/5xx with exponential backoff + jitter
+    for attempt in range(settings.HTTP_RETRIES + 1):
+        await limiter.acquire()
+        response = await client.get(url)
+
+        if response.status_code not in RETRY_STATUSES or attempt == settings.HTTP_RETRIES:
+            return response
+
+        backoff = settings.HTTP_BACKOFF * 2 ** attempt
+        await asyncio.sleep(backoff + random.uniform(0, settings.HTTP_BACKOFF_JITTER))
+
+async def geocode(client, address, limiter):
+    # same lookup order as geocoding.geocode_address: local points, cache, TomTom
+    coords = local_geocode(address)
+    if coords:
+        return coords
+
+    # the orm calls run in a thread
+    key = geocode_cache_key(address)
+    hit, coords = await sync_to_async(get_cached_geocode)(key)
+
+    if hit or not TOMTOM_API_KEY:
+        return coords
+
+    try:
+        response = await fetch(client, geocode_url(normalize_address(address)), limiter)
+        response.raise_for_status()
+
+        coords = parse_geocode_response(response.json())
+    except Exception as e:
+        print(f'Geocoding Failed for {address}', e)
+        return None
+
+    await sync_to_async(store_geocode)(key, coords)
+    return coords
+
+async def scrape_pipeline(search_url=SEARCH_URL, concurrency=None, rate=None, on_batch=None, batch_size=None):
+    """
+    with on_batch, every batch_size finished listings are handed to it (in a
+    thread, it's expected to hit the db) while the scrape keeps going and
+    nothing is returned, without it the listings are collected and returned
+    """
+    concurrency = concurrency or settings.ASYNC_SCRAPE_CONCURRENCY
+    rate = rate or settings.SCRAPE_RATE
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+
+    loop = asyncio.get_running_loop()
+    detail_queue = asyncio.Queue(maxsize=settings.ASYNC_SCRAPE_QUEUE_SIZE)
+    geocode_queue = asyncio.Queue(maxsize=settings.ASYNC_SCRAPE_QUEUE_SIZE)
+    save_queue = asyncio.Queue(maxsize=settings.ASYNC_SCRAPE_QUEUE_SIZE)
+    scrape_limiter = AsyncRateLimiter(rate)
+    geocode_limiter = AsyncRateLimiter(settings.GEOCODE_RATE)
+
+    all_listings = []
+    finished = 0
+
+    timeout = httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+    limits = httpx.Limits(max_connections=concurrency + settings.GEOCODE_WORKERS)
+
+    async with httpx.AsyncClient(headers=HEADERS, timeout=timeout, limits=limits) as client:
+        response = await fetch(client, search_url, scrape_limiter)
+        print(f"Status Code: {response.status_code}")
+
+        listings = await loop.run_in_executor(None, parse_search_results, response.content)
+        total = len(listings)
+        print(f"Found {total} Listings")
+
+        async def list_stage():
+            for index, data in enumerate(listings, 1):
+                await detail_queue.put((index, data))
+
+            for _ in range(concurrency):
+                await detail_queue.put(DONE)
+
+        async def detail_stage():
+            while (item := await detail_queue.get()) is not DONE:
+                index, data = item
+                url = data['url']
+
+                if url:
+                    print(f"[{index}/{total}] url:{url}")
+
+                    try:
+                        response = await fetch(client, url, scrape_limiter)
+                        response.raise_for_status()
+                        details = await loop.run_in_executor(None, parse_listing_details, response.content)
+                    except Exception as e:
+                        print(f"Error fetching {url}: {e}")
+                        continue
+
+                    if not details or all(v is None or v is False for v in details.values()):
+                        print(f"Listing removed/flagged")
+                        continue
+
+                    data.update(details)
+
+                await geocode_queue.put(data)
+
+        async def geocode_stage():
+            while (data := await geocode_queue.get()) is not DONE:
+                if data.get('address') and (TOMTOM_API_KEY or settings.LOCAL_GEOCODER_PATH):
+                    coords = await geocode(client, data['address'], geocode_limiter)
+
+                    if coords:
+                        data['latitude'] = coords['lat']
+                        data['longitude'] = coords['lon']
+
+                await save_queue.put(data)
+
+        async def save_stage():
+            nonlocal finished
+            batch = []
+
+            async def flush():
+                if on_batch is None:
+                    all_listings.extend(batch)
+                else:
+                    await sync_to_async(on_batch)(list(batch))
+                batch.clear()
+
+            while (data := await save_queue.get()) is not DONE:
+                finished += 1
+                batch.append(data)
+
+                if len(batch) >= batch_size:
+                    await flush()
+
+            if batch:
+                await flush()
+
+        # every stage runs in one task group, if any of them raises (a db error
+        # in on_batch, a failed cache lookup) the rest are cancelled instead of
+        # blocking forever on a full queue, and the error reaches the caller
+        try:
+            async with asyncio.TaskGroup() as group:
+                saver = group.create_task(save_stage())
+                geocoders = [group.create_task(geocode_stage()) for _ in range(settings.GEOCODE_WORKERS)]
+                producers = [group.create_task(list_stage())]
+                producers += [group.create_task(detail_stage()) for _ in range(concurrency)]
+
+                # each stage is told it's done once the one before it has finished
+                await asyncio.wait(producers)
+                for _ in geocoders:
+                    await geocode_queue.put(DONE)
+
+                await asyncio.wait(geocoders)
+                await save_queue.put(DONE)
+                await asyncio.wait([saver])
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+
+    print(f"Removed/failed: {total - finished}")
+
+    if on_batch is None:
+        return all_listings
+
+def scrape_list_urls_async(search_url=SEARCH_URL, concurrency=None, rate=None):
+    return asyncio.run(scrape_pipeline(search_url, concurrency, rate))
+
+def stream_listings_async(search_url=SEARCH_URL, concurrency=None, rate=None, batch_size=None):
+    """
+    the pipeline with ingest.save_batch as its last stage, batches are saved
+    while the scrape is still running, same totals as ingest.stream_listings
+    """
+    totals = {'created': 0, 'updated': 0, 'skipped': 0}
+
+    def save(batch):
+        counts = save_batch(batch)
+        for key in totals:
+            totals[key] += counts[key]
+
+    asyncio.run(scrape_pipeline(search_url, concurrency, rate, on_batch=save, batch_size=batch_size))
+
+    return totals
@@ -0,0 +1,61 @@
+import hashlib, time
+from django.conf import settings
+from django.core.cache import cache
+
+# bumped by every ingest path, cached values from an older version are ignored
+DATA_VERSION_KEY = 'listings:data_version'
+
+
+def new_data_version():
+    # if the counter ever gets evicted, restart it above any version handed out before
+    return time.time_ns()
+
+
+def get_data_version():
+    version = cache.get(DATA_VERSION_KEY)
+
+    if version is None:
+        cache.add(DATA_VERSION_KEY, new_data_version(), timeout=None)
+        version = cache.get(DATA_VERSION_KEY)
+
+    return version
+
+
+def bump_data_version():
+    try:
+        return cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(DATA_VERSION_KEY, new_data_version(), timeout=None)
+        return cache.get(DATA_VERSION_KEY)
+
+
+def data_etag(request, *args, **kwargs):
+    """
+    etag for a read endpoint, the data version plus what was asked for
+    (path, query string and Accept), nothing changes between bumps so an
+    unchanged poll can get its 304 off one cache read
+    """
+    asked = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return f"{get_data_version()}-{hashlib.md5(asked.encode()).hexdigest()[:16]}"
+
+
+def get_or_compute(key, compute):
+    """
+    returns the cached value for key if it was computed at the current data
+    version, otherwise computes and caches it
+    the version and the value come back in one cache round trip
+    """
+    values = cache.get_many([DATA_VERSION_KEY, key])
+
+    version = values.get(DATA_VERSION_KEY)
+    if version is None:
+        version = get_data_version()
+
+    entry = values.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    value = compute()
+    cache.set(key, (version, value), timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+
+    return value
@@ -1,13 +1,15 @@
-import requests
 from bs4 import BeautifulSoup
-import re
+import hashlib, re
+from listings import http_client
 
-def scrape_listing_details(url):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
-    }
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
+}
+
+REMOVED_STATUSES = [404, 410]
 
-    details = {
+def empty_details():
+    return {
         'bedrooms': None,
         'bathrooms': None,
         'sqft': None,
@@ -19,14 +21,75 @@ def scrape_listing_details(url):
         'extra_amenities': None,
     }
 
+def scrape_listing_details(url):
+    try:
+        response = http_client.get(url, headers=HEADERS)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return empty_details()
+
+    return parse_listing_details(response.content)
+
+def fetch_listing_details(url, etag=None, last_modified=None, content_hash=None):
+    """
+    conditional fetch for re-checking a listing we already have
+    sends If-None-Match / If-Modified-Since from the last check, and if the
+    server still answers 200 the body is hashed before parsing
+    status is 'not_modified' (304 or same hash, nothing parsed), 'ok', 'removed'
+    or 'error', along with the validators to keep for next time
+    """
+    result = {
+        'status': 'error',
+        'details': None,
+        'etag': etag,
+        'last_modified': last_modified,
+        'content_hash': content_hash,
+    }
+
+    headers = dict(HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers)
+
+        if response.status_code == 304:
+            result['status'] = 'not_modified'
+            return result
+
+        # craigslist answers a deleted post with 404/410, anything else that
+        # fails (timeouts, 5xx after retries) is an error and gets checked again
+        if response.status_code in REMOVED_STATUSES:
+            result['status'] = 'removed'
+            return result
+
         response.raise_for_status()
     except Exception as e:
         print(f"Error fetching {url}: {e}")
-        return details
-    
-    soup = BeautifulSoup(response.content, 'lxml')
+        return result
+
+    result['etag'] = response.headers.get('ETag')
+    result['last_modified'] = response.headers.get('Last-Modified')
+    result['content_hash'] = hashlib.sha256(response.content).hexdigest()
+
+    if content_hash and result['content_hash'] == content_hash:
+        result['status'] = 'not_modified'
+        return result
+
+    details = parse_listing_details(response.content)
+    result['status'] = 'ok' if details is not None else 'removed'
+    result['details'] = details
+
+    return result
+
+def parse_listing_details(content):
+    # returns None if the listing has been flagged/removed
+    details = empty_details()
+
+    soup = BeautifulSoup(content, 'lxml')
 
     removed = soup.find('div', id='has_been_removed')
     if removed:
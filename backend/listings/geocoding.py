@@ -1,55 +1,237 @@
-import requests, os
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from pathlib import Path
+from urllib.parse import quote
 from dotenv import load_dotenv
-from time import sleep
-import re
+from django.conf import settings
+from django.utils import timezone
+from listings import http_client
+from listings.models import GeocodeCache
+from listings.throttle import RateLimiter
+from listings.local_geocoder import UNIT_NUMBER, local_geocode
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 load_dotenv(BASE_DIR / '.env')
 
 TOMTOM_API_KEY = os.getenv('TOMTOM_API_KEY')
+# point this at a local mock server for tests
+TOMTOM_BASE_URL = os.getenv('TOMTOM_BASE_URL', 'https://api.tomtom.com')
+
+# only requests that actually go to TomTom wait on this, cache hits don't
+geocode_limiter = RateLimiter(settings.GEOCODE_RATE)
+
+def normalize_address(address):
+    # same pattern as the local geocoder, so '100 Steiner St' keeps its street
+    return UNIT_NUMBER.sub('', address).strip()
+
+def geocode_cache_key(address):
+    # same building with a different unit, casing or spacing shares one entry
+    key = ' '.join(normalize_address(address).lower().split())
+    return key.replace(' ,', ',')
+
+def cached_coords(entry, now):
+    # (hit, coords) for one cache row, misses stop counting after GEOCODE_NEGATIVE_TTL days
+    if entry.latitude is None:
+        expires = entry.fetched_at + timedelta(days=settings.GEOCODE_NEGATIVE_TTL)
+        return now < expires, None
+
+    return True, {'lat': float(entry.latitude), 'lon': float(entry.longitude)}
+
+def get_cached_geocode(key):
+    """
+    returns (hit, coords), coords is None for a remembered miss
+    """
+    entry = GeocodeCache.objects.filter(address=key).first()
+
+    if entry is None:
+        return False, None
+
+    return cached_coords(entry, timezone.now())
+
+def store_geocode(key, coords):
+    GeocodeCache.objects.update_or_create(
+        address=key,
+        defaults={
+            'latitude': coords['lat'] if coords else None,
+            'longitude': coords['lon'] if coords else None,
+            'fetched_at': timezone.now(),
+        },
+    )
+
+def geocode_url(address):
+    return f'{TOMTOM_BASE_URL}/search/2/geocode/{address}.json?key={TOMTOM_API_KEY}'
+
+def batch_url():
+    return f'{TOMTOM_BASE_URL}/search/2/batch/sync.json?key={TOMTOM_API_KEY}'
+
+def parse_geocode_response(data):
+    if data['results']:
+        position = data['results'][0]['position']
+
+        return {
+            'lat': position['lat'],
+            'lon': position['lon']
+        }
 
 def geocode_address(address):
-    if not address or not TOMTOM_API_KEY:
+    if not address:
         return None
-    
-    address = re.sub(r'(?i)(?:apt|unit|ste|suite)\s*#?\s*\w+', '', address)
-    address = re.sub(r'#\s*\w+', '', address).strip()
 
-    url = f'https://api.tomtom.com/search/2/geocode/{address}.json?key={TOMTOM_API_KEY}'
+    # offline address points first, no db or network needed
+    coords = local_geocode(address)
+    if coords:
+        return coords
+
+    key = geocode_cache_key(address)
+    hit, coords = get_cached_geocode(key)
+
+    if hit:
+        return coords
+
+    if not TOMTOM_API_KEY:
+        return None
+    
+    address = normalize_address(address)
 
     try:
-        response = requests.get(url)
+        geocode_limiter.acquire()
+        response = http_client.get(geocode_url(address))
         response.raise_for_status()
-        data = response.json()
         
-        if data['results']:
-            position = data['results'][0]['position']
-
-            return {
-                'lat': position['lat'],
-                'lon': position['lon']
-            }
+        coords = parse_geocode_response(response.json())
         
     except Exception as e:
+        # errors aren't cached, the next try might work
         print(f'Geocoding Failed for {address}', e)
         return None
 
+    store_geocode(key, coords)
+    return coords
+
+
+def geocode_batch(addresses):
+    """
+    one request to TomTom's synchronous batch endpoint for up to
+    GEOCODE_BATCH_SIZE addresses, returns {address: coords or None}
+    addresses whose item failed are left out so they aren't cached as misses
+    """
+    body = {
+        'batchItems': [
+            {'query': f'/geocode/{quote(address)}.json'} for address in addresses
+        ]
+    }
+
+    geocode_limiter.acquire()
+    response = http_client.post(
+        batch_url(),
+        json=body,
+        timeout=(settings.HTTP_CONNECT_TIMEOUT, settings.GEOCODE_BATCH_TIMEOUT),
+    )
+    response.raise_for_status()
 
-def batch_geocode_listings(listings):
     results = {}
+    for address, item in zip(addresses, response.json()['batchItems']):
+        if item.get('statusCode') == 200:
+            results[address] = parse_geocode_response(item['response'])
 
-    for index, listing in enumerate(listings):
-        if not listing.address:
+    return results
+
+def batch_geocode_addresses(addresses, workers=None):
+    """
+    geocodes many addresses at once, returns ({cache key: coords or None},
+    {cache key: error} for addresses whose batch request failed)
+    addresses are deduped by cache key and looked up in the cache with one
+    query, the rest go out as batch requests, GEOCODE_WORKERS at a time
+    failed addresses aren't cached, the next run tries them again
+    """
+    workers = workers or settings.GEOCODE_WORKERS
+
+    queries = {}
+    results = {}
+
+    for address in addresses:
+        if not address:
             continue
 
-        print(f"[{index+1}/{len(listings)}] Geocoding: {listing.address}")
-        coords = geocode_address(listing.address)
+        key = geocode_cache_key(address)
+        if key in queries or key in results:
+            continue
 
+        coords = local_geocode(address)
         if coords:
-            results[listing.id] = coords
+            results[key] = coords
+        else:
+            queries[key] = normalize_address(address)
+
+    now = timezone.now()
+
+    for entry in GeocodeCache.objects.filter(address__in=queries.keys()):
+        hit, coords = cached_coords(entry, now)
+
+        if hit:
+            results[entry.address] = coords
+
+    missing = [key for key in queries if key not in results]
+    failed = {}
+
+    if not missing or not TOMTOM_API_KEY:
+        return results, failed
+
+    batch_size = settings.GEOCODE_BATCH_SIZE
+    batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+
+    def run(keys):
+        try:
+            found = geocode_batch([queries[key] for key in keys])
+        except Exception as e:
+            return {}, {key: str(e) for key in keys}
+
+        return {key: found[queries[key]] for key in keys if queries[key] in found}, {}
+
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch_results, batch_failed in pool.map(run, batches):
+            fetched.update(batch_results)
+            failed.update(batch_failed)
+
+    GeocodeCache.objects.bulk_create(
+        [
+            GeocodeCache(
+                address=key,
+                latitude=coords['lat'] if coords else None,
+                longitude=coords['lon'] if coords else None,
+                fetched_at=now,
+            )
+            for key, coords in fetched.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['address'],
+        update_fields=['latitude', 'longitude', 'fetched_at'],
+        batch_size=500,
+    )
+
+    results.update(fetched)
+    return results, failed
+
+def batch_geocode_listings(listings):
+    """
+    returns ({listing id: coords} for every listing whose address could be placed,
+    {listing id: error} for listings whose batch request failed)
+    """
+    coords_by_key, failed_by_key = batch_geocode_addresses(listing.address for listing in listings)
+
+    results = {}
+    failed = {}
+    for listing in listings:
+        if not listing.address:
+            continue
 
-        sleep(.2)
+        key = geocode_cache_key(listing.address)
+        if coords_by_key.get(key):
+            results[listing.id] = coords_by_key[key]
+        elif key in failed_by_key:
+            failed[listing.id] = failed_by_key[key]
 
-    return results
\ No newline at end of file
+    return results, failed
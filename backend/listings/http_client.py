@@ -0,0 +1,70 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+# one pooled keep-alive session per host, shared by the scraper, the detail
+# scraper and the geocoder so repeat requests skip the TCP/TLS handshake
+
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def build_session():
+    retry = Retry(
+        total=settings.HTTP_RETRIES,
+        backoff_factor=settings.HTTP_BACKOFF,
+        backoff_jitter=settings.HTTP_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def get_session(url):
+    host = urlsplit(url).netloc
+
+    with _sessions_lock:
+        session = _sessions.get(host)
+
+        if session is None:
+            session = build_session()
+            _sessions[host] = session
+
+    return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def default_timeout():
+    return (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+
+
+def get(url, **kwargs):
+    kwargs.setdefault('timeout', default_timeout())
+    return get_session(url).get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    kwargs.setdefault('timeout', default_timeout())
+    return get_session(url).post(url, **kwargs)
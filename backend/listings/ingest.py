@@ -0,0 +1,256 @@
+from collections import defaultdict
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Listing
+from .etl import clean_listings_data
+from .geocoding import geocode_address
+from .scoring import recompute_scores
+from .cache import bump_data_version
+from .neighborhoods import rebuild_neighborhood_stats
+
+COORDINATE_FIELDS = ('latitude', 'longitude')
+
+def has_changes(stored, data):
+    # compares through the model fields so 1 == 1.0 and float vs Decimal coords match up
+    for field_name, value in data.items():
+        field = Listing._meta.get_field(field_name)
+
+        if field.to_python(value) != field.to_python(stored[field_name]):
+            return True
+
+    return False
+
+def save_listings(cleaned_data):
+    """
+    writes cleaned listings to the db, shared by every scrape path
+    duplicates are found in memory against one prefetch, then everything new or
+    changed is written with a single INSERT ... ON CONFLICT (craigslist_id) DO UPDATE
+    rows that come back identical aren't rewritten, so their updated_at stays put
+    returns created/updated/skipped counts
+    """
+    if not cleaned_data:
+        return {'created': 0, 'updated': 0, 'skipped': 0}
+
+    ids = {data['craigslist_id'] for data in cleaned_data}
+    titles = {data['title'] for data in cleaned_data}
+    # every column any row in the batch sent, rows don't all carry the same ones
+    update_fields = list(dict.fromkeys(
+        field for data in cleaned_data for field in data if field != 'craigslist_id'
+    ))
+    prefetch_fields = dict.fromkeys(['craigslist_id', 'title', 'location', 'price', *update_fields])
+
+    # every row that could matter, either the same id or a possible duplicate
+    stored = {
+        row['craigslist_id']: row
+        for row in Listing.objects.filter(
+            Q(craigslist_id__in=ids) | Q(title__in=titles)
+        ).values(*prefetch_fields)
+    }
+
+    # craigslist_id -> (title, location, price)
+    existing = {
+        craigslist_id: (row['title'], row['location'], row['price'])
+        for craigslist_id, row in stored.items()
+    }
+
+    ids_by_key = defaultdict(set)
+    for craigslist_id, key in existing.items():
+        ids_by_key[key].add(craigslist_id)
+
+    pending = {}
+    created_count = 0
+    updated_count = 0
+    skipped_count = 0
+
+    for data in cleaned_data:
+        craigslist_id = data['craigslist_id']
+        key = (data['title'], data['location'], data['price'])
+
+        # same title/location/price already posted under another id
+        if ids_by_key[key] - {craigslist_id}:
+            skipped_count += 1
+            continue
+
+        if craigslist_id in existing:
+            ids_by_key[existing[craigslist_id]].discard(craigslist_id)
+            updated_count += 1
+        else:
+            created_count += 1
+
+        existing[craigslist_id] = key
+        ids_by_key[key].add(craigslist_id)
+
+        pending[craigslist_id] = data
+
+    listings = []
+    touched_locations = set()
+
+    for craigslist_id, data in pending.items():
+        if craigslist_id in stored:
+            # a geocode that failed this run doesn't wipe the stored coordinates
+            data = {
+                field: value for field, value in data.items()
+                if value is not None or field not in COORDINATE_FIELDS
+            }
+
+            if not has_changes(stored[craigslist_id], data):
+                continue
+            touched_locations.add(stored[craigslist_id]['location'])
+
+            # the conflict update writes every update_field, whatever this row
+            # didn't send keeps its stored value
+            data = {**stored[craigslist_id], **data}
+
+        listing = Listing(**data)
+        touched_locations.add(listing.location)
+
+        # only new listings get geocoded, existing rows keep their coordinates
+        if craigslist_id not in stored and listing.address and not listing.latitude:
+            coords = geocode_address(listing.address)
+
+            if coords:
+                listing.latitude = coords['lat']
+                listing.longitude = coords['lon']
+
+        listings.append(listing)
+
+    if listings:
+        with transaction.atomic():
+            # updated_at is filled by auto_now on insert, and has to be
+            # listed here to move on the ON CONFLICT update
+            Listing.objects.bulk_create(
+                listings,
+                update_conflicts=True,
+                unique_fields=['craigslist_id'],
+                update_fields=[*update_fields, 'updated_at'],
+                batch_size=500,
+            )
+
+            # bulk_create skips the save signals
+            rebuild_neighborhood_stats(touched_locations)
+
+        recompute_scores(touched_locations)
+        bump_data_version()
+
+    return {
+        'created': created_count,
+        'updated': updated_count,
+        'skipped': skipped_count,
+    }
+
+def upsert_listings(rows, chunk_size=500, rescore=True):
+    """
+    applies validated listing rows (dicts keyed by model field) in one transaction
+    existing rows are prefetched with a single craigslist_id__in query and diffed
+    against what was sent, new ones go through bulk_create and changed ones through
+    bulk_update, chunk_size rows per statement. identical rows aren't written, so
+    their updated_at (and the delta sync cursor) stay put. a repeated craigslist_id
+    counts as an update, last one wins
+    with rescore=False the caller rescores the returned locations itself
+    """
+    rows_by_id = {}
+    created_count = 0
+    updated_count = 0
+    unchanged_count = 0
+
+    # every column any row sent, those are the ones the diff compares
+    sent_fields = list(dict.fromkeys(
+        field for row in rows for field in row if field != 'craigslist_id'
+    ))
+    stored = {
+        row['craigslist_id']: row
+        for row in Listing.objects.filter(
+            craigslist_id__in={row['craigslist_id'] for row in rows}
+        ).values(*dict.fromkeys(['id', 'craigslist_id', 'location', *sent_fields]))
+    }
+
+    for row in rows:
+        if row['craigslist_id'] in rows_by_id:
+            updated_count += 1
+        elif row['craigslist_id'] not in stored:
+            created_count += 1
+
+        rows_by_id[row['craigslist_id']] = row
+
+    touched_locations = set()
+    # bulk_update doesn't run auto_now
+    now = timezone.now()
+    to_create = []
+    # bulk_update writes the same columns for every object, so rows are grouped
+    # by which fields they sent and a partial row never blanks out the others
+    to_update = defaultdict(list)
+
+    for craigslist_id, row in rows_by_id.items():
+        if craigslist_id in stored:
+            if not has_changes(stored[craigslist_id], row):
+                unchanged_count += 1
+                continue
+
+            updated_count += 1
+            touched_locations.add(stored[craigslist_id]['location'])
+
+            fields = tuple(sorted({*row, 'updated_at'} - {'craigslist_id'}))
+            listing = Listing(id=stored[craigslist_id]['id'], updated_at=now, **row)
+            to_update[fields].append(listing)
+        else:
+            to_create.append(Listing(**row))
+
+        touched_locations.add(row.get('location'))
+
+    touched_locations.discard(None)
+
+    with transaction.atomic():
+        Listing.objects.bulk_create(to_create, batch_size=chunk_size)
+
+        for fields, listings in to_update.items():
+            Listing.objects.bulk_update(listings, fields, batch_size=chunk_size)
+
+        # bulk writes skip the save signals
+        rebuild_neighborhood_stats(touched_locations)
+
+    if rescore and touched_locations:
+        recompute_scores(touched_locations)
+        bump_data_version()
+
+    return {
+        'created': created_count,
+        'updated': updated_count,
+        'unchanged': unchanged_count,
+        'locations': touched_locations,
+    }
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def save_batch(batch):
+    # clean and save one micro batch, counts like save_listings
+    cleaned_data = clean_listings_data(batch)
+
+    if not cleaned_data:
+        return {'created': 0, 'updated': 0, 'skipped': 0}
+
+    return save_listings(cleaned_data)
+
+def stream_listings(listings, batch_size=None):
+    """
+    cleans and saves listings in micro batches while they're still being scraped
+    rows show up in the api within seconds and memory stays flat, if the run
+    dies part way everything before the batch in flight is already saved
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+
+    totals = {'created': 0, 'updated': 0, 'skipped': 0}
+
+    for batch in batched(listings, batch_size):
+        counts = save_batch(batch)
+
+        for key in totals:
+            totals[key] += counts[key]
+
+    return totals
@@ -0,0 +1,121 @@
+import csv, re, threading
+from array import array
+from bisect import bisect_left
+from django.conf import settings
+
+# offline geocoding from a csv of address points, loaded once into two sorted
+# parallel lists so a lookup is a bisect instead of a network round trip
+# addresses between two known points on the same street are interpolated
+
+STREET_SUFFIXES = {
+    'street': 'st', 'avenue': 'ave', 'av': 'ave', 'boulevard': 'blvd',
+    'drive': 'dr', 'road': 'rd', 'place': 'pl', 'court': 'ct', 'lane': 'ln',
+    'terrace': 'ter', 'way': 'way', 'alley': 'aly', 'highway': 'hwy',
+}
+
+DIRECTIONS = {'north': 'n', 'south': 's', 'east': 'e', 'west': 'w'}
+
+# apartment/unit numbers, whole words only, 'ste' and 'unit' turn up inside
+# street names (steiner, unity), also used for the geocode cache key
+UNIT_NUMBER = re.compile(r'\b(?:apt|unit|ste|suite)\b\.?\s*#?\s*\w+|#\s*\w+', re.IGNORECASE)
+
+_geocoders = {}
+_geocoders_lock = threading.Lock()
+
+
+def parse_street_address(address):
+    """
+    '123 Valencia Street Apt 4, San Francisco' -> ('valencia st', 123)
+    returns None for anything that doesn't start with a house number
+    """
+    street = address.split(',')[0].lower()
+    street = UNIT_NUMBER.sub('', street)
+    street = re.sub(r'[^\w\s]', ' ', street)
+
+    match = re.match(r'\s*(\d+)[a-z]?\s+(.+)', street)
+    if not match:
+        return None
+
+    words = [
+        STREET_SUFFIXES.get(word, DIRECTIONS.get(word, word))
+        for word in match.group(2).split()
+    ]
+
+    return ' '.join(words), int(match.group(1))
+
+
+class LocalGeocoder:
+    def __init__(self, points):
+        """
+        points is an iterable of (address, lat, lon)
+        """
+        parsed = []
+        for address, lat, lon in points:
+            key = parse_street_address(address)
+
+            if key:
+                parsed.append((key, float(lat), float(lon)))
+
+        parsed.sort()
+
+        self.keys = [key for key, _, _ in parsed]
+        self.lats = array('d', (lat for _, lat, _ in parsed))
+        self.lons = array('d', (lon for _, _, lon in parsed))
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            return cls((row['address'], row['latitude'], row['longitude']) for row in reader)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, address):
+        key = parse_street_address(address or '')
+        if key is None:
+            return None
+
+        street, number = key
+        index = bisect_left(self.keys, key)
+
+        if index < len(self.keys) and self.keys[index] == key:
+            return {'lat': self.lats[index], 'lon': self.lons[index]}
+
+        # not an exact point, interpolate between the neighbours on the same street
+        before = index - 1
+        after = index
+
+        if (
+            before < 0 or after >= len(self.keys)
+            or self.keys[before][0] != street or self.keys[after][0] != street
+        ):
+            return None
+
+        low = self.keys[before][1]
+        high = self.keys[after][1]
+        ratio = (number - low) / (high - low)
+
+        return {
+            'lat': self.lats[before] + (self.lats[after] - self.lats[before]) * ratio,
+            'lon': self.lons[before] + (self.lons[after] - self.lons[before]) * ratio,
+        }
+
+
+def get_local_geocoder():
+    # None when LOCAL_GEOCODER_PATH isn't set, loaded once per path
+    path = settings.LOCAL_GEOCODER_PATH
+    if not path:
+        return None
+
+    with _geocoders_lock:
+        if path not in _geocoders:
+            _geocoders[path] = LocalGeocoder.from_csv(path)
+            print(f"Loaded {len(_geocoders[path])} address points from {path}")
+
+        return _geocoders[path]
+
+
+def local_geocode(address):
+    geocoder = get_local_geocoder()
+    return geocoder.lookup(address) if geocoder else None
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from listings.models import Listing
 from listings.geocoding import batch_geocode_listings
+from listings.cache import bump_data_version
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
@@ -20,22 +22,32 @@ class Command(BaseCommand):
         
         self.stdout.write(f'Found {total} listings to geocode')
 
-        results = batch_geocode_listings(list(listings_to_geocode))
+        results, failed = batch_geocode_listings(list(listings_to_geocode.only('id', 'address')))
 
-        success_count = 0
-        for listing_id, coords in results.items():
-            listing = Listing.objects.get(id=listing_id)
-            listing.latitude = coords['lat']
-            listing.longitude = coords['lon']
-            listing.save()
-            success_count += 1
+        # batch requests that errored, one line per distinct error
+        for error in sorted(set(failed.values())):
+            count = sum(1 for value in failed.values() if value == error)
+            self.stdout.write(self.style.ERROR(f"Geocoding request failed for {count} listings: {error}"))
 
-        failed_count = total - success_count
+        # one bulk_update instead of a get + save per listing
+        now = timezone.now()
+        geocoded = [
+            Listing(id=listing_id, latitude=coords['lat'], longitude=coords['lon'], updated_at=now)
+            for listing_id, coords in results.items()
+        ]
+        Listing.objects.bulk_update(geocoded, ['latitude', 'longitude', 'updated_at'], batch_size=500)
+        success_count = len(geocoded)
+
+        bump_data_version()
+
+        not_found_count = total - success_count - len(failed)
+        style = self.style.WARNING if failed else self.style.SUCCESS
         self.stdout.write(
-            self.style.SUCCESS(
+            style(
                 f"\n=== Geocoding Complete ===\n"
                 f"Success: {success_count}\n"
-                f"Failed: {failed_count}\n"
+                f"Not found: {not_found_count}\n"
+                f"Failed requests (retried next run): {len(failed)}\n"
                 f"Total: {total}"
             )
         )
\ No newline at end of file
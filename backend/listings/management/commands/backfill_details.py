@@ -1,53 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
 from listings.models import Listing
-from listings.detail_scraper import scrape_listing_details
-import time, random
+from listings.detail_scraper import fetch_listing_details, empty_details
+from listings.ingest import batched
+from listings.neighborhoods import rebuild_neighborhood_stats
+from listings.scoring import recompute_scores
+from listings.cache import bump_data_version
+from listings.throttle import RateLimiter
+
+DETAIL_FIELDS = list(empty_details())
+
+
+def read_checkpoint(path):
+    try:
+        return int(Path(path).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, last_id):
+    # write then rename, a crash mid write never leaves a half written id
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(str(last_id))
+    tmp.replace(path)
+
 
 class Command(BaseCommand):
+    help = 'Scrape detail pages for listings missing them, resumable from the last finished id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Detail pages fetched at once')
+        parser.add_argument('--rate', type=float, help='Max detail requests per second')
+        parser.add_argument('--batch-size', type=int, help='Rows written per bulk_update')
+        parser.add_argument('--checkpoint', help='File holding the last finished id')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+
     def handle(self, *args, **options):
+        workers = options['workers'] or settings.SCRAPE_WORKERS
+        rate = options['rate'] or settings.BACKFILL_RATE
+        batch_size = options['batch_size'] or settings.BACKFILL_BATCH_SIZE
+        checkpoint = options['checkpoint'] or settings.BACKFILL_CHECKPOINT
+
+        start_after = 0 if options['restart'] else read_checkpoint(checkpoint)
+        if start_after:
+            self.stdout.write(f"Resuming after id {start_after}")
+
         listings_to_backfill = Listing.objects.filter(
             active=True,
-            bedrooms__isnull=True
-        )
+            bedrooms__isnull=True,
+            id__gt=start_after,
+        ).order_by('id')
 
         total = listings_to_backfill.count()
 
         if total == 0:
-            self.stdout(self.style.SUCCESS("No listings need backfilling"))
+            self.stdout.write(self.style.SUCCESS("No listings need backfilling"))
             return
         
         self.stdout.write(f"Found {total} listings needing backfill")
 
+        limiter = RateLimiter(rate)
+
+        def fetch(listing):
+            limiter.acquire()
+
+            try:
+                return fetch_listing_details(listing.url), None
+            except Exception as e:
+                return None, e
+
         updated = 0
         inactive = 0
         failed = 0
+        processed = 0
+        # the checkpoint never moves past a failed id, so a rerun retries it
+        first_failed_id = None
 
-        for index, listing in enumerate(listings_to_backfill, 1):
-            try:
-                self.stdout.write(f"[{index}/{total}] Scraping: {listing.url}")
-                details = scrape_listing_details(listing.url)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch in batched(listings_to_backfill.iterator(), batch_size):
+                to_save = []
+                now = timezone.now()
+
+                # map keeps the batch in id order, so the checkpoint is always
+                # the last id of a batch that's fully written (or just below a failure)
+                for listing, (result, error) in zip(batch, pool.map(fetch, batch)):
+                    processed += 1
+
+                    # fetch errors come back as status 'error', not as a removed listing
+                    if error or result['status'] == 'error':
+                        failed += 1
+                        first_failed_id = first_failed_id or listing.id
+                        self.stdout.write(self.style.ERROR(f"Failed to scrape {listing.url}: {error or 'fetch failed'}"))
+                        continue
+
+                    if result['status'] == 'removed':
+                        self.stdout.write(
+                            self.style.WARNING(f"  → {listing.url} removed/flagged, marking inactive")
+                        )
+                        listing.active = False
+                        inactive += 1
+                    else:
+                        for key, value in result['details'].items():
+                            setattr(listing, key, value)
+                        updated += 1
 
-                if not details or all(v is None or v is False for v in details.values()):
-                    self.stdout.write(
-                        self.style.WARNING(f"  → Listing removed/flagged, marking inactive")
+                    listing.updated_at = now
+                    to_save.append(listing)
+
+                locations = {listing.location for listing in to_save}
+
+                with transaction.atomic():
+                    Listing.objects.bulk_update(
+                        to_save, [*DETAIL_FIELDS, 'active', 'updated_at'], batch_size=batch_size
                     )
-                    listing.active = False
-                    listing.save()
-                    inactive += 1
-                    time.sleep(random.uniform(0, 1.5))
-                    continue
-
-                for key, value in details.items():
-                    setattr(listing, key, value)
-                
-                self.stdout.write("Listing succesfully scraped")
-                listing.save()
-                updated += 1
-
-                time.sleep(random.uniform(0, 1.5))
-            except Exception as e:
-                failed += 1
-                self.stdout.write(self.style.ERROR(f"Failed to scrape {listing.url}: {e}"))
+                    # bulk_update skips the save signals
+                    rebuild_neighborhood_stats(locations)
+
+                # rescored per batch too, an interrupted run leaves nothing stale behind
+                recompute_scores(locations)
+                bump_data_version()
+
+                done_through = batch[-1].id
+                if first_failed_id is not None:
+                    done_through = min(done_through, first_failed_id - 1)
+
+                write_checkpoint(checkpoint, done_through)
+                self.stdout.write(f"[{processed}/{total}] saved through id {done_through}")
+
+        # finished, the next run (say after a parser fix) starts from the top
+        # and picks up anything that failed, those still have no details
+        Path(checkpoint).unlink(missing_ok=True)
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -55,6 +144,6 @@ class Command(BaseCommand):
                 f"✓ Updated with details: {updated}\n"
                 f"⚠ Marked inactive (removed): {inactive}\n"
                 f"✗ Failed (errors): {failed}\n"
-                f"Total processed: {total}\n"
+                f"Total processed: {processed}\n"
             )
         )
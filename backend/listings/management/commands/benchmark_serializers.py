@@ -0,0 +1,52 @@
+import statistics, time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from listings.models import Listing
+from listings.renderers import ORJSONRenderer
+from listings.serializers import ListingSerializer, ListingListSerializer, serialize_values
+
+
+def drf_path(queryset, serializer_class):
+    # what ListingViewSet.list did before, instances -> ModelSerializer -> JSONRenderer
+    return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+
+def values_path(queryset, serializer_class):
+    serializer = serializer_class()
+    rows = queryset.values(*serializer.fields)
+    return ORJSONRenderer().render(serialize_values(rows, serializer))
+
+
+def time_path(path, queryset, serializer_class, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = path(queryset.all(), serializer_class)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return statistics.median(timings), len(body)
+
+
+class Command(BaseCommand):
+    help = 'Time the DRF serializer path against the values() + orjson path on a large listing response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Listings per response')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path for the timing')
+
+    def handle(self, *args, **options):
+        queryset = Listing.objects.order_by('-scraped_at', '-id')[:options['rows']]
+        rows = queryset.count()
+        if rows == 0:
+            raise CommandError('No listings to serialize')
+
+        self.stdout.write(f"{rows} listings per response, median of {options['repeat']} runs\n")
+
+        for label, serializer_class in [('slim list', ListingListSerializer), ('full', ListingSerializer)]:
+            drf_ms, drf_bytes = time_path(drf_path, queryset, serializer_class, options['repeat'])
+            fast_ms, fast_bytes = time_path(values_path, queryset, serializer_class, options['repeat'])
+
+            self.stdout.write(self.style.SUCCESS(f"== {label} ({len(serializer_class.Meta.fields)} fields)"))
+            self.stdout.write(f"  drf serializer:    {drf_ms:8.1f} ms  {drf_bytes} bytes")
+            self.stdout.write(f"  values + orjson:   {fast_ms:8.1f} ms  {fast_bytes} bytes")
+            self.stdout.write(f"  speedup:           {drf_ms / fast_ms:8.1f}x\n")
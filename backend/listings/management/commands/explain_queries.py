@@ -0,0 +1,80 @@
+import statistics, time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from listings.algorithms import PRICE_PER_SQFT_FIELDS, price_per_sqft_listings
+from listings.dashboard import ANALYTICS_FIELDS, analytics_listings
+from listings.models import Listing
+from listings.scoring import SCORING_COLUMNS, BEST_VALUE_THRESHOLD
+
+
+def hot_queries(location='Mission District', title='Sunny 1BR'):
+    """
+    the queries every request or scrape run leans on, by name
+    each one should be served by an index from listings/models.py
+    """
+    active = Listing.objects.filter(active=True)
+    now = timezone.now()
+    with_details = active.filter(bedrooms__isnull=False)
+
+    return {
+        # ListingViewSet.list
+        'list_newest': active.order_by('-scraped_at', '-id')[:50],
+        # ListingViewSet.list, any page after the first
+        'list_next_page': active.filter(
+            Q(scraped_at__lt=now) | Q(scraped_at=now, id__lt=1000)
+        ).order_by('-scraped_at', '-id')[:50],
+        # scoring.recompute_scores(locations)
+        'rescore_location': active.filter(location__in=[location]).order_by().values_list(*SCORING_COLUMNS),
+        # neighborhoods.aggregate_neighborhood_stats(locations)
+        'neighborhood_totals': with_details.filter(location__in=[location])
+            .values('location').annotate(listing_count=Count('id')).order_by(),
+        # algorithms.get_best_price_per_sqft, the same values_list load_columns runs
+        'price_per_sqft': price_per_sqft_listings().values_list(*PRICE_PER_SQFT_FIELDS),
+        # dashboard.build_analytics, every section of the analytics endpoint
+        'analytics': analytics_listings().values_list(*ANALYTICS_FIELDS),
+        # algorithms.get_overall_best_value
+        'best_value': active.filter(best_value__gte=BEST_VALUE_THRESHOLD)
+            .order_by('-best_value', '-scraped_at')[:10],
+        # ingest.save_listings duplicate check
+        'duplicate_check': Listing.objects.filter(
+            Q(craigslist_id__in=['0']) | Q(title__in=[title])
+        ).values_list('craigslist_id', 'title', 'location', 'price'),
+    }
+
+
+def time_query(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset.all())
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = 'Print the query plan and median run time of the hot Listing queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query for the timing')
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (postgres only)')
+
+    def handle(self, *args, **options):
+        location = (
+            Listing.objects.filter(active=True).values_list('location', flat=True).first()
+            or 'Mission District'
+        )
+        total = Listing.objects.count()
+
+        self.stdout.write(f"{connection.vendor}, {total} listings, location={location!r}\n")
+
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+
+        for name, queryset in hot_queries(location).items():
+            median = time_query(queryset, options['repeat'])
+
+            self.stdout.write(self.style.SUCCESS(f"== {name} ({median:.2f} ms median)"))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
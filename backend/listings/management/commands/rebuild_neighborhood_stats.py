@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from listings.neighborhoods import rebuild_neighborhood_stats, check_neighborhood_stats
+from listings.cache import bump_data_version
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report locations whose stats drifted from the listings table',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatched = check_neighborhood_stats()
+
+            if mismatched:
+                raise CommandError(
+                    f"{len(mismatched)} neighborhoods out of sync: {', '.join(mismatched)}"
+                )
+
+            self.stdout.write(self.style.SUCCESS("Neighborhood stats are consistent"))
+            return
+
+        total = rebuild_neighborhood_stats()
+        bump_data_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt stats for {total} neighborhoods")
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from listings.scoring import recompute_scores
+from listings.cache import bump_data_version
+
+class Command(BaseCommand):
+    def handle(self, *args, **options):
+        self.stdout.write("Recomputing deal scores for all active listings")
+
+        total = recompute_scores()
+        bump_data_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rescored {total} listings")
+        )
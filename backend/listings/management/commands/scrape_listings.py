@@ -1,58 +1,16 @@
 from django.core.management.base import BaseCommand
-from listings.models import Listing
-from listings.scraper import scrape_list_urls
-from listings.etl import clean_listings_data
-from listings.geocoding import geocode_address
-from listings.serializers import ListingSerializer
-import time, requests, os
+from listings.scraper import iter_listings
+from listings.ingest import stream_listings
+from listings.sync import sync_changes
+import os
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
-        listings_data = scrape_list_urls()
-
-        cleaned_data = clean_listings_data(listings_data)
-
-        created_count = 0
-        updated_count = 0
-        skipped_count = 0
-
-        for data in cleaned_data:
-            duplicate_exists = Listing.objects.filter(
-                title=data['title'],
-                location=data['location'],
-                price=data['price']
-            ).exclude(craigslist_id=data['craigslist_id']).exists()
-
-            if duplicate_exists:
-                skipped_count += 1
-                continue
-
-            listing, created = Listing.objects.get_or_create(
-                craigslist_id=data['craigslist_id'],
-                defaults=data
-            )
-            
-            if created:
-                created_count += 1
-
-                if listing.address and not listing.latitude:
-                    coords = geocode_address(listing.address)
-
-                    if coords:
-                        listing.latitude = coords['lat']
-                        listing.longitude = coords['lon']
-                        listing.save()
-                    time.sleep(.2)
-            else:
-                for key, value in data.items():
-                    setattr(listing, key, value)
-
-                listing.save()
-                updated_count += 1
+        counts = stream_listings(iter_listings())
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Created: {created_count}, Updated: {updated_count}"
+                f"Created: {counts['created']}, Updated: {counts['updated']}"
             )
         )
     
@@ -61,32 +19,25 @@ class Command(BaseCommand):
     def sync_to_production(self):
         prod_url = os.getenv('PRODUCTION_API_URL')
 
-        try:
-            listings = Listing.objects.filter(active=True)
-
-            serializer = ListingSerializer(listings, many=True)
-            data = serializer.data
+        if not prod_url:
+            self.stdout.write(self.style.WARNING("\nPRODUCTION_API_URL not set, skipping sync"))
+            return
 
-            self.stdout.write(f"\nSyncing {len(data)} listings to production...")
+        try:
+            # only rows changed since the last successful sync, see listings/sync.py
+            totals = sync_changes(prod_url)
 
-            response = requests.post(
-                f'{prod_url}/api/listings/bulk_create_listings/',
-                json=data
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"\nPRODUCTION: Sent {totals['listings']} changed listings "
+                    f"({totals['bytes']} bytes gzipped), "
+                    f"Created {totals['created']}, Updated {totals['updated']}, Unchanged {totals['unchanged']}"
+                )
             )
 
-            if response.status_code == 200:
-                result = response.json()
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"PRODUCTION: Created {result['created']}, "
-                        f"Updated {result['updated']}"
-                    )
-                )
-            else:
+            for error in totals['errors']:
                 self.stdout.write(
-                    self.style.ERROR(
-                        f"Production sync failed: {response.status_code} - {response.text}"
-                    )
+                    self.style.WARNING(f"Rejected {error['craigslist_id']}: {error['errors']}")
                 )
         except Exception as e:
             self.stdout.write(
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from listings.async_scraper import stream_listings_async
+
+class Command(BaseCommand):
+    help = 'Scrape, geocode and save listings with the asyncio pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Detail pages in flight at once')
+        parser.add_argument('--rate', type=float, help='Max detail requests per second')
+
+    def handle(self, *args, **options):
+        # batches are saved as they fill, not after the whole scrape
+        counts = stream_listings_async(
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created: {counts['created']}, Updated: {counts['updated']}, Skipped: {counts['skipped']}"
+            )
+        )
@@ -1,30 +1,75 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from listings.models import Listing
-from listings.detail_scraper import scrape_listing_details
-from listings.serializers import ListingSerializer
-import time, random, os, requests
+from listings.detail_scraper import fetch_listing_details
+from listings.scoring import recompute_scores
+from listings.cache import bump_data_version
+from listings.sync import sync_changes
+from listings.refresh import get_due_listings, schedule_next_check, check_interval
+import time, random, os
 
 class Command(BaseCommand):
+    help = 'Re-check the most overdue active listings, see listings/refresh.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Max listings to check this run')
+        parser.add_argument('--budget', type=int, help='Seconds after which no new checks are started')
+
     def handle(self, *args, **options):
-        listings = Listing.objects.filter(active=True)
+        limit = options['limit'] or settings.REFRESH_BATCH_SIZE
+        budget = options['budget'] or settings.REFRESH_TIME_BUDGET
+
+        listings = list(get_due_listings(limit))
 
-        total = listings.count()
-        self.stdout.write(f"Checking {total} active listings")
+        total = len(listings)
+        self.stdout.write(f"Checking {total} due listings")
 
         new_inactive = 0
         changed = 0
         unchanged = 0
+        not_modified = 0
+        failed = 0
 
-        changed_listings = []
-        inactive_ids = []
+        touched_locations = set()
+        started = time.monotonic()
 
         for index, listing in enumerate(listings, 1):
+            if time.monotonic() - started >= budget:
+                self.stdout.write(
+                    self.style.WARNING(f"Time budget used up, {total - index + 1} left for next run")
+                )
+                break
+
             try:
                 self.stdout.write(f"[{index}/{total}] Checking: {listing.url}")
 
-                details = scrape_listing_details(listing.url)
+                result = fetch_listing_details(
+                    listing.url,
+                    etag=listing.etag,
+                    last_modified=listing.last_modified,
+                    content_hash=listing.content_hash,
+                )
+
+                # 304 or byte for byte the same page, nothing to parse, only reschedule
+                if result['status'] == 'not_modified':
+                    listing.save(update_fields=schedule_next_check(listing, changed=False))
+                    unchanged += 1
+                    not_modified += 1
+                    time.sleep(random.uniform(1.5, 3))
+                    continue
+
+                # timeouts, connection errors and 5xx after retries, the listing
+                # is probably still up so it only gets pushed back, never deactivated
+                # (a 404/410 comes back as 'removed' below)
+                if result['status'] == 'error':
+                    self.stdout.write(self.style.WARNING(f"Fetch failed, checking again later"))
+                    listing.save(update_fields=schedule_next_check(listing, changed=False))
+                    failed += 1
+                    time.sleep(random.uniform(1.5, 3))
+                    continue
 
-                if not details or all(v is None or v is False for v in details.values()):
+                if result['status'] == 'removed':
                     self.stdout.write(
                         self.style.WARNING(f"Listing appears removed, marking inactive")
                     )
@@ -32,10 +77,11 @@ class Command(BaseCommand):
                     listing.active = False
                     listing.save()
                     new_inactive += 1
-                    inactive_ids.append(listing.craigslist_id)
+                    touched_locations.add(listing.location)
                     time.sleep(random.uniform(1.5, 3))
                     continue
-                
+
+                details = result['details']
                 changes_detected = False
 
                 for key, new_value in details.items():
@@ -46,91 +92,87 @@ class Command(BaseCommand):
                         setattr(listing, key, new_value)
                         changes_detected = True
                 
+                listing.etag = result['etag']
+                listing.last_modified = result['last_modified']
+                listing.content_hash = result['content_hash']
+                schedule_fields = schedule_next_check(listing, changed=changes_detected)
+
                 if changes_detected:
                     listing.save()
                     changed += 1
-                    changed_listings.append(listing)
+                    touched_locations.add(listing.location)
                 else:
+                    # page changed but nothing we track did, only the validators
+                    # move so updated_at (and the next sync) are left alone
+                    listing.save(update_fields=['etag', 'last_modified', 'content_hash', *schedule_fields])
                     unchanged += 1
 
                 time.sleep(random.uniform(1.5, 3))
                 
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f"Error checking: {e}"))
+
+                # push it back so one broken page doesn't sit at the front of the queue
+                now = timezone.now()
+                Listing.objects.filter(id=listing.id).update(
+                    next_check_at=now + check_interval(listing, now)
+                )
+
+            finally:
+                # a run can take up to the time budget, so changes go live (and the
+                # api etags move) every few checks instead of only at the end
+                if index % settings.REFRESH_PUBLISH_EVERY == 0:
+                    self.publish(touched_locations)
+
+        self.publish(touched_locations)
     
         self.stdout.write(
             self.style.SUCCESS(
                 f"\n=== Update Complete ===\n"
-                f"Unchanged: {unchanged}\n"
+                f"Unchanged: {unchanged} ({not_modified} not modified)\n"
                 f"Changed: {changed}\n"
                 f"New inactive: {new_inactive}\n"
-                f"Total checked: {total}"
+                f"Failed (rescheduled): {failed}\n"
+                f"Total checked: {changed + unchanged + new_inactive}"
             )
         )
 
-        self.sync_to_production(changed_listings, inactive_ids)
-
+        # saves above moved updated_at, so changed and inactive rows both go out
+        self.sync_to_production()
 
-    def sync_to_production(self, changed_listings, inactive_ids):
-        prod_url = os.getenv('PRODUCTION_API_URL')
-
-        if changed_listings:
-            try:
-                self.stdout.write(f"\nSyncing {len(changed_listings)} changed listings to production")
+    def publish(self, touched_locations):
+        # rescore what changed since the last publish and bump the data version
+        if not touched_locations:
+            return
 
-                serializer = ListingSerializer(changed_listings, many=True)
-                data = serializer.data
+        recompute_scores(touched_locations)
+        bump_data_version()
+        touched_locations.clear()
 
-                response = requests.post(
-                    f'{prod_url}/api/listings/bulk_create_listings/',
-                    json=data
-                )
+    def sync_to_production(self):
+        prod_url = os.getenv('PRODUCTION_API_URL')
 
-                if response.status_code == 200:
-                    result = response.json()
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"PRODUCTION: Synced {result['updated']} changed listings"
-                        )
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f"Production sync failed: {response.status_code} - {response.text}"
-                        )
-                    )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"Production sync error: {str(e)}")
-                )
+        if not prod_url:
+            self.stdout.write(self.style.WARNING("\nPRODUCTION_API_URL not set, skipping sync"))
+            return
 
-        if inactive_ids:
-            try:
-                self.stdout.write(f"\nMarking {len(inactive_ids)} listings as inactive in production")
+        try:
+            # only rows changed since the last successful sync, see listings/sync.py
+            totals = sync_changes(prod_url)
 
-                response = requests.post(
-                    f'{prod_url}/api/listings/mark_inactive/',
-                    json={'craigslist_ids': inactive_ids}
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"\nPRODUCTION: Sent {totals['listings']} changed listings "
+                    f"({totals['bytes']} bytes gzipped), "
+                    f"Created {totals['created']}, Updated {totals['updated']}, Unchanged {totals['unchanged']}"
                 )
+            )
 
-                if response.status_code == 200:
-                    result = response.json()
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"PRODUCTION: Marked {result['marked_inactive']} as inactive"
-                        )
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f"Production inactive sync failed: {response.status_code}"
-                        )
-                    )
-            except Exception as e:
+            for error in totals['errors']:
                 self.stdout.write(
-                    self.style.ERROR(f"Production inactive sync error: {str(e)}")
+                    self.style.WARNING(f"Rejected {error['craigslist_id']}: {error['errors']}")
                 )
-
-        #realistically, this only hits if both params are incorrect types
-        if not changed_listings and not inactive_ids:
-            self.stdout.write('\nNo changes to sync to production, this should never hit')
\ No newline at end of file
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f"Production sync error: {str(e)}")
+            )
\ No newline at end of file
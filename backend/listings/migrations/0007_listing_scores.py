@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_listing_below_market_listing_best_value_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listing',
+            name='below_market',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='listing',
+            name='best_value',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='listing',
+            name='price_per_sqft',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['-best_value'], name='listing_best_value_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Min, Max
+from django.db.models.functions import Coalesce
+
+
+def populate_neighborhood_stats(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    NeighborhoodStats = apps.get_model('listings', 'NeighborhoodStats')
+
+    rows = Listing.objects.filter(
+        active=True,
+        bedrooms__isnull=False
+    ).values('location').annotate(
+        listing_count=Count('id'),
+        price_sum=Sum('price'),
+        min_price=Min('price'),
+        max_price=Max('price'),
+        bedrooms_sum=Sum('bedrooms'),
+        sqft_sum=Coalesce(Sum('sqft'), 0),
+        sqft_count=Count('sqft'),
+    ).order_by()
+
+    NeighborhoodStats.objects.bulk_create(NeighborhoodStats(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_listing_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NeighborhoodStats',
+            fields=[
+                ('location', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('listing_count', models.IntegerField(default=0)),
+                ('price_sum', models.BigIntegerField(default=0)),
+                ('min_price', models.IntegerField(blank=True, null=True)),
+                ('max_price', models.IntegerField(blank=True, null=True)),
+                ('bedrooms_sum', models.IntegerField(default=0)),
+                ('sqft_sum', models.BigIntegerField(default=0)),
+                ('sqft_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'neighborhood stats',
+            },
+        ),
+        migrations.RunPython(populate_neighborhood_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_neighborhoodstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCursor',
+            fields=[
+                ('target', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('synced_until', models.DateTimeField(blank=True, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_listing_updated_at_synccursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
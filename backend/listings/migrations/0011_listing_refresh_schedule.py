@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_listing_http_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='change_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='next_check_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
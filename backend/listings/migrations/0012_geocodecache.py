@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_listing_refresh_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('address', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=7, max_digits=10, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=7, max_digits=10, null=True)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'geocode cache',
+            },
+        ),
+    ]
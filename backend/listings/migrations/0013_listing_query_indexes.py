@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_geocodecache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('active', True)), fields=['-scraped_at'], name='listing_active_scraped_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('active', True)), fields=['location', 'price'], name='listing_active_loc_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('active', True), ('bedrooms__isnull', False)), fields=['location', 'price', 'sqft'], name='listing_with_details_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['title', 'location', 'price'], name='listing_title_loc_price_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_listing_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='listing',
+            name='listing_active_scraped_idx',
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('active', True)), fields=['-scraped_at', '-id'], name='listing_active_scraped_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils import timezone
 
+NEIGHBORHOOD_STATS_FIELDS = ['active', 'location', 'price', 'bedrooms', 'sqft']
+
 #only for craigslist for now
 class Listing(models.Model):
 
@@ -63,16 +65,129 @@ class Listing(models.Model):
 
     #metadata
     scraped_at = models.DateTimeField(default=timezone.now)
+    # bumped on every save, bulk writes have to set it themselves
+    # sync.py ships rows changed since the last successful sync
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     active = models.BooleanField(default=True)
     data_quality = models.IntegerField(default=0)
     
-    #best deal scores
-    best_value = models.IntegerField(default=0)
-    below_market = models.IntegerField(default=0)
-    price_per_sqft = models.IntegerField(default=0)
+    #validators from the last detail page fetch, for conditional re-checks
+    etag = models.CharField(max_length=255, null=True, blank=True)
+    last_modified = models.CharField(max_length=64, null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+
+    #refresh schedule for update_listings, see refresh.py
+    next_check_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    change_count = models.IntegerField(default=0)
+
+    #best deal scores, filled by scoring.recompute_scores
+    best_value = models.FloatField(default=0)
+    below_market = models.FloatField(null=True, blank=True)
+    price_per_sqft = models.FloatField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.title} - {self.price}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+
+        # remember what this row contributed to NeighborhoodStats when it was loaded,
+        # so saves can apply just the difference (see neighborhoods.py)
+        if all(field in field_names for field in NEIGHBORHOOD_STATS_FIELDS):
+            instance._loaded_stats = instance.stats_contribution()
+
+        return instance
+
+    def stats_contribution(self):
+        # only active listings with details count towards neighborhood stats
+        if not self.active or self.bedrooms is None:
+            return None
+
+        return (self.location, self.price, self.bedrooms, self.sqft)
     
     class Meta:
-        ordering = ['-scraped_at']
\ No newline at end of file
+        ordering = ['-scraped_at']
+        indexes = [
+            models.Index(fields=['-best_value'], name='listing_best_value_idx'),
+            # active=True is a partial index condition rather than a leading column,
+            # a bare boolean filter can't use a leading column on sqlite
+            # list endpoint, newest active listings first, id breaks ties for the
+            # keyset pages in pagination.py
+            models.Index(
+                fields=['-scraped_at', '-id'],
+                name='listing_active_scraped_idx',
+                condition=models.Q(active=True),
+            ),
+            # rescoring, price distribution and filters by neighborhood
+            models.Index(
+                fields=['location', 'price'],
+                name='listing_active_loc_price_idx',
+                condition=models.Q(active=True),
+            ),
+            # neighborhood stats and the deal sections only look at active listings with details
+            models.Index(
+                fields=['location', 'price', 'sqft'],
+                name='listing_with_details_idx',
+                condition=models.Q(active=True, bedrooms__isnull=False),
+            ),
+            # duplicate repost check in ingest.save_listings
+            models.Index(fields=['title', 'location', 'price'], name='listing_title_loc_price_idx'),
+        ]
+
+
+# running totals per location, kept up to date as listings change
+# so neighborhood averages are a primary key lookup instead of a GROUP BY
+class NeighborhoodStats(models.Model):
+    location = models.CharField(max_length=255, primary_key=True)
+    listing_count = models.IntegerField(default=0)
+    price_sum = models.BigIntegerField(default=0)
+    min_price = models.IntegerField(null=True, blank=True)
+    max_price = models.IntegerField(null=True, blank=True)
+    bedrooms_sum = models.IntegerField(default=0)
+    sqft_sum = models.BigIntegerField(default=0)
+    sqft_count = models.IntegerField(default=0)
+
+    @property
+    def avg_price(self):
+        return self.price_sum / self.listing_count if self.listing_count else None
+
+    @property
+    def median_bedrooms(self):
+        # named after the original stats, it's the average
+        return self.bedrooms_sum / self.listing_count if self.listing_count else None
+
+    @property
+    def avg_sqft(self):
+        return self.sqft_sum / self.sqft_count if self.sqft_count else None
+
+    def __str__(self):
+        return f"{self.location} - {self.listing_count} listings"
+
+    class Meta:
+        verbose_name_plural = 'neighborhood stats'
+
+
+# how far each sync target has been caught up, see sync.py
+class SyncCursor(models.Model):
+    target = models.CharField(max_length=255, primary_key=True)
+    synced_until = models.DateTimeField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.target} - {self.synced_until}"
+
+
+# geocoder results keyed by normalized address, see geocoding.py
+# a row with no coordinates is a remembered miss, retried after GEOCODE_NEGATIVE_TTL days
+class GeocodeCache(models.Model):
+    address = models.CharField(max_length=255, primary_key=True)
+    latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.address} - {self.latitude}, {self.longitude}"
+
+    class Meta:
+        verbose_name_plural = 'geocode cache'
@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max, F, Q
+from django.db.models.functions import Coalesce
+from .models import Listing, NeighborhoodStats
+
+STATS_TOTAL_FIELDS = [
+    'listing_count', 'price_sum', 'min_price', 'max_price',
+    'bedrooms_sum', 'sqft_sum', 'sqft_count',
+]
+
+
+def aggregate_neighborhood_stats(locations=None):
+    # full GROUP BY over the listings, what the stats table should contain
+    listings = Listing.objects.filter(active=True, bedrooms__isnull=False)
+
+    if locations is not None:
+        listings = listings.filter(location__in=locations)
+
+    rows = listings.values('location').annotate(
+        listing_count=Count('id'),
+        price_sum=Sum('price'),
+        min_price=Min('price'),
+        max_price=Max('price'),
+        bedrooms_sum=Sum('bedrooms'),
+        sqft_sum=Coalesce(Sum('sqft'), 0),
+        sqft_count=Count('sqft'),
+    ).order_by()
+
+    return {row['location']: NeighborhoodStats(**row) for row in rows}
+
+
+def rebuild_neighborhood_stats(locations=None):
+    """
+    recompute stats from scratch for the given locations (all if None)
+    used after bulk writes that skip the save signals
+    """
+    if locations is not None:
+        locations = set(locations)
+        if not locations:
+            return 0
+
+    with transaction.atomic():
+        fresh = aggregate_neighborhood_stats(locations)
+
+        stale = NeighborhoodStats.objects.exclude(location__in=fresh.keys())
+        if locations is not None:
+            stale = stale.filter(location__in=locations)
+        stale.delete()
+
+        NeighborhoodStats.objects.bulk_create(
+            fresh.values(),
+            update_conflicts=True,
+            unique_fields=['location'],
+            update_fields=STATS_TOTAL_FIELDS,
+        )
+
+    return len(fresh)
+
+
+def check_neighborhood_stats():
+    """
+    returns the locations whose stored stats don't match the listings table
+    """
+    fresh = aggregate_neighborhood_stats()
+    stored = {
+        stats.location: stats
+        for stats in NeighborhoodStats.objects.filter(listing_count__gt=0)
+    }
+
+    mismatched = []
+    for location in set(fresh) | set(stored):
+        expected = fresh.get(location)
+        actual = stored.get(location)
+
+        if expected is None or actual is None:
+            mismatched.append(location)
+            continue
+
+        if any(getattr(expected, field) != getattr(actual, field) for field in STATS_TOTAL_FIELDS):
+            mismatched.append(location)
+
+    return sorted(mismatched)
+
+
+def refresh_extremes(location):
+    extremes = Listing.objects.filter(
+        active=True,
+        bedrooms__isnull=False,
+        location=location
+    ).aggregate(min_price=Min('price'), max_price=Max('price'))
+
+    NeighborhoodStats.objects.filter(location=location).update(**extremes)
+
+
+def remove_contribution(contribution):
+    location, price, bedrooms, sqft = contribution
+
+    NeighborhoodStats.objects.filter(location=location).update(
+        listing_count=F('listing_count') - 1,
+        price_sum=F('price_sum') - price,
+        bedrooms_sum=F('bedrooms_sum') - bedrooms,
+        sqft_sum=F('sqft_sum') - (sqft or 0),
+        sqft_count=F('sqft_count') - (0 if sqft is None else 1),
+    )
+
+    # a delta can't undo a min/max, look those up again if this price was one
+    removed_extreme = NeighborhoodStats.objects.filter(
+        Q(min_price=price) | Q(max_price=price),
+        location=location,
+    ).exists()
+
+    if removed_extreme:
+        refresh_extremes(location)
+
+
+def add_contribution(contribution):
+    location, price, bedrooms, sqft = contribution
+
+    NeighborhoodStats.objects.get_or_create(location=location)
+
+    stats = NeighborhoodStats.objects.filter(location=location)
+    stats.update(
+        listing_count=F('listing_count') + 1,
+        price_sum=F('price_sum') + price,
+        bedrooms_sum=F('bedrooms_sum') + bedrooms,
+        sqft_sum=F('sqft_sum') + (sqft or 0),
+        sqft_count=F('sqft_count') + (0 if sqft is None else 1),
+    )
+    stats.filter(Q(min_price__isnull=True) | Q(min_price__gt=price)).update(min_price=price)
+    stats.filter(Q(max_price__isnull=True) | Q(max_price__lt=price)).update(max_price=price)
+
+
+def apply_stats_change(old, new):
+    """
+    old/new are Listing.stats_contribution() before and after a write
+    """
+    if old == new:
+        return
+
+    with transaction.atomic():
+        if old is not None:
+            remove_contribution(old)
+        if new is not None:
+            add_contribution(new)
@@ -0,0 +1,134 @@
+import base64, binascii, json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ListingCursorPagination(BasePagination):
+    """
+    keyset pagination for the listing list endpoint
+    rows are ordered by one of the view's ordering_fields plus id as a tie breaker,
+    and the cursor holds the last row's (value, id) so the next page is a
+    WHERE on the index instead of an OFFSET scan, page 50 costs the same as page 1
+    forward only, which is all infinite scroll needs
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = settings.LISTINGS_PAGE_SIZE
+        requested = request.query_params.get(self.page_size_query_param)
+
+        if requested:
+            try:
+                page_size = int(requested)
+            except ValueError:
+                pass
+
+        return max(1, min(page_size, settings.LISTINGS_MAX_PAGE_SIZE))
+
+    def get_ordering(self, request, queryset, view):
+        # same ?ordering= the OrderingFilter accepts, only the first field is used
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return ordering[0]
+
+        return view.ordering[0]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return value, int(last_id)
+        except (binascii.Error, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, value, last_id):
+        encoded = base64.urlsafe_b64encode(json.dumps([value, last_id]).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        ordering = self.get_ordering(request, queryset, view)
+        descending = ordering.startswith('-')
+        self.field = queryset.model._meta.get_field(ordering.lstrip('-'))
+        name = self.field.name
+
+        # nullable fields (bedrooms, bathrooms) sort their nulls last both ways,
+        # sqlite and postgres disagree on where they go otherwise
+        nulls_last = True if self.field.null else None
+        if descending:
+            queryset = queryset.order_by(F(name).desc(nulls_last=nulls_last), '-id')
+        else:
+            queryset = queryset.order_by(F(name).asc(nulls_last=nulls_last), 'id')
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            value, last_id = cursor
+            id_past = Q(id__lt=last_id) if descending else Q(id__gt=last_id)
+
+            if value is None:
+                # already into the trailing nulls
+                queryset = queryset.filter(id_past, **{f'{name}__isnull': True})
+            else:
+                try:
+                    value = self.field.to_python(value)
+                except ValidationError:
+                    raise NotFound(self.invalid_cursor_message)
+
+                past = f'{name}__lt' if descending else f'{name}__gt'
+                keyset = Q(**{past: value}) | (Q(**{name: value}) & id_past)
+                if self.field.null:
+                    keyset |= Q(**{f'{name}__isnull': True})
+                queryset = queryset.filter(keyset)
+
+        # one extra row tells us whether there's a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        # rows are values() dicts on the list endpoint, instances anywhere else
+        last = self.page[-1]
+        if isinstance(last, dict):
+            value, last_id = last[self.field.attname], last['id']
+        else:
+            value, last_id = getattr(last, self.field.attname), last.id
+
+        if value is not None:
+            value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+        return self.encode_cursor(value, last_id)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,48 @@
+import gzip, json, zlib
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+
+class GzipJSONParser(JSONParser):
+    """
+    json parser that also accepts bodies sent with Content-Encoding: gzip,
+    which is how sync.py ships listings
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+
+        if request is not None and request.META.get('HTTP_CONTENT_ENCODING') == 'gzip':
+            stream = gzip.GzipFile(fileobj=stream)
+
+        return super().parse(stream, media_type, parser_context)
+
+
+class NDJSONParser(BaseParser):
+    """
+    newline delimited json, one listing per line, optionally gzipped
+    returns a generator instead of a list so the view can work through the
+    body while it's still being read
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+
+        if request is not None and request.META.get('HTTP_CONTENT_ENCODING') == 'gzip':
+            stream = gzip.GzipFile(fileobj=stream)
+
+        return self.iter_rows(stream)
+
+    def iter_rows(self, stream):
+        try:
+            for line_number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ParseError(f'line {line_number}: {e}')
+        except (OSError, EOFError, zlib.error) as e:
+            # truncated or corrupt gzip
+            raise ParseError(f'could not decompress body: {e}')
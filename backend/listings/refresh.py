@@ -0,0 +1,57 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Listing
+
+# update_listings used to walk every active listing each run, now every listing
+# carries a next_check_at and a run only takes the most overdue ones
+#
+# interval = REFRESH_BASE_HOURS
+#   * (1 + age in weeks)         old listings rarely change or get rented
+#   / (1 + change_count)         listings that changed before tend to again
+#   * (1.5 - best_value / 100)   good deals get rented fast, check them more
+# clamped to REFRESH_MIN_HOURS .. REFRESH_MAX_HOURS
+
+
+def check_interval(listing, now):
+    age_weeks = max((now - listing.scraped_at).total_seconds(), 0) / (7 * 24 * 3600)
+    best_value = min(max(listing.best_value or 0, 0), 100)
+
+    hours = (
+        settings.REFRESH_BASE_HOURS
+        * (1 + age_weeks)
+        / (1 + listing.change_count)
+        * (1.5 - best_value / 100)
+    )
+
+    hours = min(max(hours, settings.REFRESH_MIN_HOURS), settings.REFRESH_MAX_HOURS)
+    return timedelta(hours=hours)
+
+
+def schedule_next_check(listing, changed, now=None):
+    """
+    sets change_count and next_check_at on the listing after a check
+    returns the fields that need saving
+    """
+    now = now or timezone.now()
+
+    if changed:
+        listing.change_count += 1
+
+    listing.next_check_at = now + check_interval(listing, now)
+
+    return ['change_count', 'next_check_at']
+
+
+def get_due_listings(limit, now=None):
+    # never checked first, then most overdue, best deals break ties
+    now = now or timezone.now()
+
+    return Listing.objects.filter(
+        Q(next_check_at__isnull=True) | Q(next_check_at__lte=now),
+        active=True,
+    ).order_by(
+        F('next_check_at').asc(nulls_first=True),
+        '-best_value',
+    )[:limit]
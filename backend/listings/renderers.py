@@ -0,0 +1,22 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    drop in for DRF's JSONRenderer, orjson does the str/int/float/list/dict work
+    in C and anything else (Decimal, datetime, numpy, lazy strings) goes through
+    DRF's own encoder so the output matches what JSONRenderer gave
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return orjson.dumps(data, default=JSONEncoder().default, option=self.options)
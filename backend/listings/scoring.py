@@ -0,0 +1,232 @@
+import numpy as np
+from .models import Listing, NeighborhoodStats
+
+# price per sqft outside of this range is almost always bad data
+MIN_PRICE_PER_SQFT = 1.50
+MAX_PRICE_PER_SQFT = 6.00
+
+# listings scoring below this aren't shown as best value
+BEST_VALUE_THRESHOLD = 50
+
+SCORE_FIELDS = ['best_value', 'below_market', 'price_per_sqft']
+
+# (inclusive upper edges, points per tier), last tier catches everything above
+PRICE_PER_SQFT_TIERS = ([2.50, 3.00, 3.50, 4.00], [30, 25, 20, 15, 10])
+PERCENT_OF_AVG_TIERS = ([70, 80, 90, 100], [25, 20, 15, 10, 5])
+PRICE_PER_BEDROOM_TIERS = ([1500, 2000, 2500, 3000], [20, 15, 10, 5, 0])
+
+PARKING_POINTS = {'garage': 7, 'off_street': 5, 'carport': 3, 'street': 1}
+LAUNDRY_POINTS = {'in_unit': 5, 'on_site': 3}
+# indexed by number of pet types allowed
+PET_POINTS = [0, 2, 3]
+
+INTEGER_FIELDS = {'id', 'price', 'bedrooms', 'sqft', 'data_quality'}
+NUMERIC_FIELDS = INTEGER_FIELDS | {'bathrooms', 'best_value', 'below_market', 'price_per_sqft'}
+
+SCORING_COLUMNS = [
+    'id', 'price', 'location', 'bedrooms', 'sqft', 'parking',
+    'laundry_type', 'cats_allowed', 'dogs_allowed', 'data_quality',
+]
+
+
+def get_neighborhood_averages(locations=None):
+    # primary key lookups on the running totals, see neighborhoods.py
+    stats = NeighborhoodStats.objects.filter(listing_count__gt=0)
+
+    if locations is not None:
+        stats = stats.filter(location__in=locations)
+
+    return {stat.location: stat.avg_price for stat in stats}
+
+
+def get_amenity_score(listing):
+    return (
+        PARKING_POINTS.get(listing.parking, 0)
+        + LAUNDRY_POINTS.get(listing.laundry_type, 0)
+        + PET_POINTS[bool(listing.cats_allowed) + bool(listing.dogs_allowed)]
+    )
+
+
+def load_columns(queryset, fields):
+    """
+    pulls just the given fields with values_list and returns one numpy array
+    per field, nullable numbers come back as floats with nan for None
+    """
+    rows = list(queryset.values_list(*fields))
+    columns = list(zip(*rows)) if rows else [()] * len(fields)
+
+    arrays = {}
+    for field, column in zip(fields, columns):
+        if field in NUMERIC_FIELDS:
+            arrays[field] = np.array(column, dtype=float)
+        else:
+            arrays[field] = np.array(column, dtype=object)
+
+    return arrays
+
+
+def get_row(columns, index):
+    # one row back as plain python values, nan -> None
+    row = {}
+    for field, column in columns.items():
+        value = column[index]
+
+        if field in NUMERIC_FIELDS:
+            if np.isnan(value):
+                value = None
+            elif field in INTEGER_FIELDS:
+                value = int(value)
+            else:
+                value = float(value)
+
+        row[field] = value
+
+    return row
+
+
+def map_locations(locations, values):
+    # dict lookup once per distinct location instead of once per row
+    if len(locations) == 0:
+        return np.array([], dtype=float)
+
+    unique, inverse = np.unique(locations.astype(str), return_inverse=True)
+    lookup = np.array([values.get(location) or np.nan for location in unique], dtype=float)
+
+    return lookup[inverse]
+
+
+def tier_scores(values, tiers):
+    # upper edges are inclusive, same as the old if/elif <= chains
+    edges, points = tiers
+    return np.asarray(points)[np.digitize(values, edges, right=True)]
+
+
+def round_like_python(values, ndigits):
+    """
+    np.round scales then rounds, so values like 1.535 can land on the other side
+    of the builtin round(), which rounds the exact binary value
+    only the few values sitting right on a half get rounded by python
+    """
+    rounded = np.round(values, ndigits)
+
+    scaled = values * 10 ** ndigits
+    near_half = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for index in near_half:
+        rounded[index] = round(float(values[index]), ndigits)
+
+    return rounded
+
+
+def top_k(keys, k):
+    """
+    indexes of the k smallest keys, in order
+    ties keep their original order so results match a stable sort
+    """
+    if len(keys) <= k:
+        return np.argsort(keys, kind='stable')
+
+    kth = keys[np.argpartition(keys, k - 1)[:k]].max()
+    candidates = np.flatnonzero(keys <= kth)
+    order = np.argsort(keys[candidates], kind='stable')
+
+    return candidates[order][:k]
+
+
+def score_columns(columns, neighborhood_avgs):
+    """
+    ai weights
+    - Price per sqft (30%)
+    - Below neighborhood average (25%)
+    - Price per bedroom (20%)
+    - Amenities (parking, laundry) (15%)
+    - Data quality (10%)
+
+    returns arrays for every score column, unscorable listings get 0 best_value
+    """
+    price = columns['price']
+    sqft = columns['sqft']
+    bedrooms = columns['bedrooms']
+    avg_price = map_locations(columns['location'], neighborhood_avgs)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_per_sqft = np.where(sqft > 0, price / sqft, np.nan)
+        percent_of_avg = (price / avg_price) * 100
+        price_per_br = price / bedrooms
+
+    has_avg = avg_price > 0
+
+    scorable = (
+        (bedrooms > 0)
+        & (sqft > 0)
+        & (price_per_sqft >= MIN_PRICE_PER_SQFT)
+        & (price_per_sqft <= MAX_PRICE_PER_SQFT)
+    )
+
+    amenity_score = (
+        np.select(
+            [columns['parking'] == value for value in PARKING_POINTS],
+            list(PARKING_POINTS.values()),
+            0,
+        )
+        + np.select(
+            [columns['laundry_type'] == value for value in LAUNDRY_POINTS],
+            list(LAUNDRY_POINTS.values()),
+            0,
+        )
+        + np.asarray(PET_POINTS)[
+            columns['cats_allowed'].astype(bool).astype(int)
+            + columns['dogs_allowed'].astype(bool).astype(int)
+        ]
+    )
+
+    score = (
+        tier_scores(price_per_sqft, PRICE_PER_SQFT_TIERS)
+        + np.where(has_avg, tier_scores(percent_of_avg, PERCENT_OF_AVG_TIERS), 0)
+        + tier_scores(price_per_br, PRICE_PER_BEDROOM_TIERS)
+        + amenity_score
+        + (columns['data_quality'] / 100) * 10
+    )
+
+    return {
+        'best_value': np.where(scorable, score, 0),
+        'below_market': np.where(has_avg & ~np.isnan(bedrooms), 100 - percent_of_avg, np.nan),
+        'price_per_sqft': price_per_sqft,
+    }
+
+
+def recompute_scores(locations=None):
+    """
+    rescore every active listing in the given locations (all if None)
+    any change to a listing moves its neighborhood average, so the whole
+    neighborhood gets rescored together
+    """
+    if locations is not None:
+        locations = set(locations)
+        if not locations:
+            return 0
+
+    neighborhood_avgs = get_neighborhood_averages(locations)
+
+    # no ordering, rows are written back by id
+    listings = Listing.objects.filter(active=True).order_by()
+    if locations is not None:
+        listings = listings.filter(location__in=locations)
+
+    columns = load_columns(listings, SCORING_COLUMNS)
+    scores = score_columns(columns, neighborhood_avgs)
+
+    scored = [
+        Listing(
+            id=int(listing_id),
+            best_value=float(best_value),
+            below_market=None if np.isnan(below_market) else float(below_market),
+            price_per_sqft=None if np.isnan(price_per_sqft) else float(price_per_sqft),
+        )
+        for listing_id, best_value, below_market, price_per_sqft in zip(
+            columns['id'], scores['best_value'], scores['below_market'], scores['price_per_sqft']
+        )
+    ]
+
+    Listing.objects.bulk_update(scored, SCORE_FIELDS, batch_size=500)
+
+    return len(scored)
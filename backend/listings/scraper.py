@@ -1,24 +1,24 @@
-import time, random, requests, logging
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
+from django.conf import settings
 from listings.detail_scraper import scrape_listing_details
+from listings.throttle import RateLimiter
+from listings import http_client
 
-def scrape_list_urls():
-    all_listings = []
-    removed_count = 0
-
-    url = f"https://sfbay.craigslist.org/search/sfc/apa#search=2~gallery~0"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
-    }
+SEARCH_URL = "https://sfbay.craigslist.org/search/sfc/apa#search=2~gallery~0"
 
-    response = requests.get(url, headers=headers)
-    print(f"Status Code: {response.status_code}")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36"
+}
 
-    soup = BeautifulSoup(response.content, 'lxml')
+def parse_search_results(content):
+    soup = BeautifulSoup(content, 'lxml')
     listings = soup.find_all('li', class_='cl-static-search-result')
-    print(f"Found {len(listings)} Listings")
 
-    for index, listing in enumerate(listings, 1):
+    results = []
+
+    for listing in listings:
         link = listing.find('a')
         url = link['href'] if link else None
 
@@ -37,27 +37,72 @@ def scrape_list_urls():
         location_div = listing.find('div', class_='location')
         location = location_div.text.strip() if location_div else None
 
-        data = {
+        results.append({
             'craigslist_id': craigslist_id,
             'url': url,
             'title': title,
             'price': price,
             'location': location,
-        }
+        })
+
+    return results
+
+def iter_listings(search_url=SEARCH_URL, workers=None, rate=None):
+    """
+    yields each listing as soon as its detail page has been scraped
+    detail pages are fetched by a pool of worker threads, all sharing one
+    rate limiter so the request rate stays the same as fetching serially
+    """
+    workers = workers or settings.SCRAPE_WORKERS
+    rate = rate or settings.SCRAPE_RATE
+
+    response = http_client.get(search_url, headers=HEADERS)
+    print(f"Status Code: {response.status_code}")
+
+    listings = parse_search_results(response.content)
+    total = len(listings)
+    print(f"Found {total} Listings")
 
-        if url:
-            print(f"[{index}/{len(listings)}] url:{url}")
+    limiter = RateLimiter(rate)
+
+    def fetch_details(indexed_listing):
+        index, data = indexed_listing
+        url = data['url']
+
+        if not url:
+            return data
+
+        limiter.acquire()
+        print(f"[{index}/{total}] url:{url}")
+
+        try:
             details = scrape_listing_details(url)
+        except Exception as e:
+            print(f"Error parsing {url}: {e}")
+            return None
+
+        if not details or all(v is None or v is False for v in details.values()):
+            print(f"Listing removed/flagged")
+            return None
 
-            if not details or all(v is None or v is False for v in details.values()):
-                print(f"Listing removed/flagged")
+        data.update(details)
+        return data
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    removed_count = 0
+
+    try:
+        for data in executor.map(fetch_details, enumerate(listings, 1)):
+            if data is None:
                 removed_count += 1
-                time.sleep(random.uniform(3, 5))
                 continue
-            
-            data.update(details)
-            time.sleep(random.uniform(3, 5))
 
-        all_listings.append(data)
+            yield data
+    finally:
+        # consumer stopped early, don't keep fetching pages nobody will read
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"Removed/failed: {removed_count}")
 
-    return all_listings
\ No newline at end of file
+def scrape_list_urls(search_url=SEARCH_URL, workers=None, rate=None):
+    return list(iter_listings(search_url, workers, rate))
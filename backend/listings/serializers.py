@@ -1,8 +1,22 @@
 from rest_framework import serializers
 from .models import Listing
 
+class SparseFieldsMixin:
+    """
+    drops every field not named in the 'fields' context entry (from ?fields=),
+    fewer fields means less per row work when a list is serialized
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 # Converts Listing model to JSON and vice versa
-class ListingSerializer(serializers.ModelSerializer):
+class ListingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Listing
         fields = [
@@ -30,4 +44,51 @@ class ListingSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id',
             'scraped_at',
-        ]
\ No newline at end of file
+        ]
+
+# default for the list endpoint, what the table rows and map pins show
+# everything else comes from the retrieve endpoint or ?fields=
+class ListingListSerializer(ListingSerializer):
+    class Meta(ListingSerializer.Meta):
+        fields = [
+            'id',
+            'url',
+            'title',
+            'price',
+            'location',
+            'bedrooms',
+            'bathrooms',
+            'sqft',
+            'latitude',
+            'longitude',
+        ]
+
+# used by bulk_create_listings, rows are matched on craigslist_id there so the
+# per row unique check (one query each) is skipped and scraped_at is kept
+class ListingUpsertSerializer(ListingSerializer):
+    class Meta(ListingSerializer.Meta):
+        read_only_fields = ['id']
+        extra_kwargs = {
+            'craigslist_id': {'validators': []},
+        }
+
+
+def serialize_values(rows, serializer):
+    """
+    turns values() rows into the same dicts serializer would build from instances,
+    only decimal and datetime columns need converting, the rest are already json types
+    """
+    names = list(serializer.fields)
+    data = [{name: row[name] for name in names} for row in rows]
+
+    for name, field in serializer.fields.items():
+        if not isinstance(field, (serializers.DecimalField, serializers.DateTimeField)):
+            continue
+
+        # one column at a time, lat/long/bathrooms come back from the db as Decimal
+        convert = field.to_representation
+        for row in data:
+            if row[name] is not None:
+                row[name] = convert(row[name])
+
+    return data
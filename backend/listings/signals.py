@@ -0,0 +1,40 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Listing, NEIGHBORHOOD_STATS_FIELDS
+from .neighborhoods import apply_stats_change
+
+# keeps NeighborhoodStats in step with single listing saves and deletes
+# bulk_create / bulk_update / queryset.update() skip these, callers of those
+# rebuild the touched locations with rebuild_neighborhood_stats()
+
+def touches_stats(update_fields):
+    return update_fields is None or any(field in update_fields for field in NEIGHBORHOOD_STATS_FIELDS)
+
+
+@receiver(pre_save, sender=Listing)
+def load_previous_stats(sender, instance, raw, update_fields, **kwargs):
+    if raw or instance.pk is None or hasattr(instance, '_loaded_stats'):
+        return
+
+    if not touches_stats(update_fields):
+        return
+
+    previous = Listing.objects.filter(pk=instance.pk).only(*NEIGHBORHOOD_STATS_FIELDS).first()
+    instance._loaded_stats = previous._loaded_stats if previous else None
+
+
+@receiver(post_save, sender=Listing)
+def update_neighborhood_stats(sender, instance, created, raw, update_fields, **kwargs):
+    if raw or not touches_stats(update_fields):
+        return
+
+    old = None if created else getattr(instance, '_loaded_stats', None)
+    new = instance.stats_contribution()
+
+    apply_stats_change(old, new)
+    instance._loaded_stats = new
+
+
+@receiver(post_delete, sender=Listing)
+def remove_neighborhood_stats(sender, instance, **kwargs):
+    apply_stats_change(getattr(instance, '_loaded_stats', instance.stats_contribution()), None)
@@ -0,0 +1,129 @@
+import json, tempfile, zlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from . import http_client
+from .models import Listing, SyncCursor
+from .serializers import ListingSerializer
+
+# pushes local changes to another instance's bulk_upsert_stream endpoint
+# only rows whose updated_at moved since the last successful sync are sent,
+# as gzipped NDJSON, and the cursor advances after every request that lands
+
+# gzip bodies bigger than this spill from memory to a temp file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class SyncError(Exception):
+    pass
+
+
+def get_changed_listings(since, until):
+    # rows saved after until wait for the next run
+    listings = Listing.objects.filter(updated_at__lt=until)
+
+    # first sync to a target, there's no point shipping old inactive rows
+    if since is None:
+        return listings.filter(active=True)
+
+    # >= so a row saved in the same instant as the last sync isn't missed,
+    # sending it twice is harmless since the endpoint upserts
+    return listings.filter(updated_at__gte=since)
+
+
+def write_ndjson_gzip(listings, body):
+    """
+    serializes listings one line at a time straight into a gzip stream
+    returns how many were written and the last one
+    """
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip header
+    count = 0
+    last = None
+
+    for listing in listings:
+        line = json.dumps(ListingSerializer(listing).data, cls=DjangoJSONEncoder)
+        body.write(compressor.compress(line.encode() + b'\n'))
+        count += 1
+        last = listing
+
+    body.write(compressor.flush())
+    return count, last
+
+
+def post_body(url, body):
+    response = http_client.post(
+        url,
+        data=body,
+        headers={'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'},
+        timeout=(settings.HTTP_CONNECT_TIMEOUT, settings.SYNC_READ_TIMEOUT),
+    )
+
+    if response.status_code != 200:
+        raise SyncError(f"{response.status_code} - {response.text[:500]}")
+
+    return response.json()
+
+
+def sync_changes(base_url, chunk_size=None):
+    """
+    sends every listing changed since the last sync to base_url, chunk_size
+    rows per request. rows are paged with a (updated_at, id) keyset and written
+    to a spooled file, so nothing holds the whole delta in memory
+    returns counts, errors reported by the target and gzipped bytes sent
+    raises SyncError if a request is rejected, earlier requests stay synced
+    """
+    chunk_size = chunk_size or settings.SYNC_CHUNK_SIZE
+    url = f'{base_url}/api/listings/bulk_upsert_stream/'
+
+    cursor, _ = SyncCursor.objects.get_or_create(target=base_url)
+    started = timezone.now()
+
+    # updated_at is stamped before the write commits (upsert_listings takes its now
+    # before the transaction), so a row can land behind the cursor after a run read
+    # past it. every run re-reads SYNC_OVERLAP seconds back, the target upserts so
+    # the repeats are harmless
+    since = cursor.synced_until
+    if since is not None:
+        since -= timedelta(seconds=settings.SYNC_OVERLAP)
+
+    changed = get_changed_listings(since, started).order_by('updated_at', 'id')
+
+    totals = {'listings': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'errors': [], 'bytes': 0}
+    after = None
+
+    while True:
+        page = changed
+        if after is not None:
+            page = page.filter(
+                Q(updated_at__gt=after.updated_at)
+                | Q(updated_at=after.updated_at, id__gt=after.id)
+            )
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as body:
+            count, last = write_ndjson_gzip(page[:chunk_size].iterator(), body)
+
+            if not count:
+                break
+
+            totals['bytes'] += body.tell()
+            body.seek(0)
+            result = post_body(url, body)
+
+        totals['created'] += result['created']
+        totals['updated'] += result['updated']
+        totals['unchanged'] += result.get('unchanged', 0)
+        totals['errors'].extend(result.get('errors', []))
+        totals['listings'] += count
+
+        # everything up to the last row sent is done, a failed run resumes from here
+        cursor.synced_until = last.updated_at
+        cursor.save(update_fields=['synced_until'])
+        after = last
+
+    cursor.synced_until = started
+    cursor.last_synced_at = timezone.now()
+    cursor.save()
+
+    return totals
@@ -1,9 +1,7 @@
 from celery import shared_task
-from time import sleep
-from .scraper import scrape_list_urls
-from .models import Listing
-from .etl import clean_listings_data
-from .geocoding import geocode_address
+from .scraper import iter_listings
+from .async_scraper import stream_listings_async
+from .ingest import stream_listings
 import time, random
 
 @shared_task
@@ -12,45 +10,15 @@ def scrape_listings_task():
     # delay scrape by 2 to 30 mins
     # time.sleep(random.uniform(120, 1800))
 
-    listings_data = scrape_list_urls()
-
-    cleaned_data = clean_listings_data(listings_data)
-    
-    created_count = 0
-    updated_count = 0
-    skipped_count = 0
+    # scrape -> clean -> save in small batches, see ingest.stream_listings
+    counts = stream_listings(iter_listings())
     
-    for data in cleaned_data:
-        duplicate_exists = Listing.objects.filter(
-            title=data['title'],
-            location=data['location'],
-            price=data['price']
-        ).exclude(craigslist_id=data['craigslist_id']).exists()
-
-        if duplicate_exists:
-            skipped_count += 1
-            continue
+    return f"Created: {counts['created']}, Updated: {counts['updated']}, Skipped {counts['skipped']}"
 
-        listing, created = Listing.objects.get_or_create(
-            craigslist_id=data['craigslist_id'],
-            defaults=data
-        )
-        
-        if created:
-            created_count += 1
-
-            if listing.address and not listing.latitude:
-                coords = geocode_address(listing.address)
+@shared_task
+def scrape_listings_async_task():
+    # same as scrape_listings_task, with the asyncio pipeline doing the scraping,
+    # geocoding and saving each batch as it fills
+    counts = stream_listings_async()
 
-                if coords:
-                    listing.latitude = coords['lat']
-                    listing.longitude = coords['lon']
-                    listing.save()
-                sleep(.2)
-        else:
-            for key, value in data.items():
-                setattr(listing, key, value)
-            listing.save()
-            updated_count += 1
-    
-    return f"Created: {created_count}, Updated: {updated_count}, Skipped {skipped_count}"
\ No newline at end of file
+    return f"Created: {counts['created']}, Updated: {counts['updated']}, Skipped {counts['skipped']}"
@@ -0,0 +1,308 @@
+import json
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from ..cache import DATA_VERSION_KEY, bump_data_version, get_data_version
+from ..management.commands.explain_queries import hot_queries
+from ..models import Listing
+from ..neighborhoods import check_neighborhood_stats
+from ..renderers import ORJSONRenderer
+from ..serializers import ListingSerializer, serialize_values
+from .utils import ListingTestCase, listing_data, make_listing
+
+
+class AnalyticsCacheTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        make_listing('1', price=2000)
+
+    def test_cached_until_data_version_bumps(self):
+        response = self.client.get('/api/listings/analytics/')
+        self.assertEqual(response.json()['overall']['total_listings'], 1)
+
+        make_listing('2', price=2500)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/listings/analytics/')
+        self.assertEqual(response.json()['overall']['total_listings'], 1)
+
+        bump_data_version()
+
+        response = self.client.get('/api/listings/analytics/')
+        self.assertEqual(response.json()['overall']['total_listings'], 2)
+
+    def test_bad_distribution_by_rejected_before_building(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/listings/analytics/?distribution_by=title')
+        self.assertEqual(response.status_code, 400)
+
+    def test_mark_inactive_invalidates(self):
+        self.client.get('/api/listings/analytics/')
+
+        self.client.post(
+            '/api/listings/mark_inactive/',
+            {'craigslist_ids': ['1']},
+            content_type='application/json',
+        )
+
+        response = self.client.get('/api/listings/analytics/')
+        self.assertEqual(response.json()['overall']['total_listings'], 0)
+
+    def test_version_survives_eviction(self):
+        version = get_data_version()
+        cache.delete(DATA_VERSION_KEY)
+        self.assertGreater(bump_data_version(), version)
+
+
+class BulkCreateEndpointTests(ListingTestCase):
+    def post(self, rows):
+        return self.client.post(
+            '/api/listings/bulk_create_listings/', rows, content_type='application/json'
+        )
+
+    def test_upserts_and_reports_bad_rows(self):
+        make_listing('1', price=2000, latitude=37.76, longitude=-122.42)
+
+        response = self.post([
+            {'craigslist_id': '1', 'url': 'https://sfbay.craigslist.org/apa/d/1.html',
+             'title': 'listing 1', 'price': 2200, 'location': 'Noe Valley'},
+            listing_data('2', id=99, scraped_at='2025-01-01T00:00:00Z'),
+            listing_data('3', price='lots'),
+            'not a listing',
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [2, 3])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+
+        # fields the row didn't send are left alone
+        updated = Listing.objects.get(craigslist_id='1')
+        self.assertEqual((updated.price, updated.location, updated.sqft), (2200, 'Noe Valley', 800))
+        self.assertEqual(float(updated.latitude), 37.76)
+
+        created = Listing.objects.get(craigslist_id='2')
+        self.assertNotEqual(created.id, 99)
+        self.assertEqual(created.scraped_at.year, 2025)
+        self.assertFalse(Listing.objects.filter(craigslist_id='3').exists())
+        self.assertEqual(check_neighborhood_stats(), [])
+        self.assertGreater(created.best_value, 0)
+
+    def test_identical_rows_are_not_rewritten(self):
+        self.post([listing_data('1'), listing_data('2')])
+        before = dict(Listing.objects.values_list('craigslist_id', 'updated_at'))
+
+        response = self.post([listing_data('1'), listing_data('2', price=2500)])
+
+        self.assertEqual(
+            (response.data['created'], response.data['updated'], response.data['unchanged']), (0, 1, 1)
+        )
+        after = dict(Listing.objects.values_list('craigslist_id', 'updated_at'))
+        self.assertEqual(after['1'], before['1'])
+        self.assertGreater(after['2'], before['2'])
+
+    def test_query_count_does_not_grow_with_payload(self):
+        self.post([listing_data(str(index)) for index in range(5)])
+
+        with self.assertNumQueries(13):
+            self.post([listing_data(str(index), price=2500) for index in range(10)])
+
+        with self.assertNumQueries(13):
+            self.post([listing_data(str(index), price=2600) for index in range(40)])
+
+    def test_rejects_non_list(self):
+        response = self.post({'craigslist_id': '1'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(LISTINGS_PAGE_SIZE=3)
+class ListingPaginationTests(ListingTestCase):
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        return seen
+
+    def test_pages_cover_every_listing_once(self):
+        # same scraped_at everywhere so the id tie breaker has to do the work
+        scraped_at = timezone.now()
+        for index in range(8):
+            make_listing(str(index), scraped_at=scraped_at, bedrooms=index % 3 or None)
+        make_listing('inactive', active=False)
+
+        expected = list(Listing.objects.filter(active=True).order_by('-id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/listings/'), expected)
+
+        # nullable ordering fields put their nulls at the end both ways
+        for ordering in ['bedrooms', '-bedrooms']:
+            with self.subTest(ordering):
+                ids = self.walk(f'/api/listings/?ordering={ordering}')
+                self.assertEqual(sorted(ids), sorted(expected))
+                bedrooms = [Listing.objects.get(id=i).bedrooms for i in ids]
+                self.assertEqual(bedrooms[-2:], [None, None])
+
+    def test_later_pages_cost_one_query(self):
+        for index in range(7):
+            make_listing(str(index), price=2000 + index * 100)
+
+        response = self.client.get('/api/listings/?ordering=-price')
+        self.assertEqual([row['price'] for row in response.json()['results']], [2600, 2500, 2400])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(response.json()['next'])
+        self.assertEqual([row['price'] for row in response.json()['results']], [2300, 2200, 2100])
+
+    def test_bad_cursor(self):
+        response = self.client.get('/api/listings/?cursor=nope')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(LISTINGS_PAGE_SIZE=2)
+class SparseFieldsTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            make_listing(str(index), price=2000 + index * 100, extra_amenities='roof deck')
+
+    def test_list_is_slim_and_retrieve_is_full(self):
+        row = self.client.get('/api/listings/').json()['results'][0]
+        self.assertNotIn('extra_amenities', row)
+        self.assertIn('latitude', row)
+
+        detail = self.client.get(f"/api/listings/{row['id']}/").json()
+        self.assertEqual(detail['extra_amenities'], 'roof deck')
+
+    def test_fields_limits_columns_and_keys(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/listings/?fields=id,price&ordering=-price')
+
+        self.assertEqual(response.json()['results'], [
+            {'id': row.id, 'price': row.price}
+            for row in Listing.objects.order_by('-price')[:2]
+        ])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('extra_amenities', queries[0]['sql'])
+
+        # the ordering column is loaded even when not asked for, so the next link costs nothing extra
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/listings/?fields=id&ordering=-price')
+        self.assertEqual(list(response.json()['results'][0]), ['id'])
+        self.assertIn('fields=id', response.json()['next'])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/listings/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+
+
+class FastSerializationTests(ListingTestCase):
+    def test_matches_drf_serializer(self):
+        make_listing('1', bathrooms='1.5', latitude='37.7599', longitude='-122.4148', address='1 Valencia St')
+        make_listing('2', bedrooms=None, bathrooms=None, extra_amenities='roof deck')
+
+        queryset = Listing.objects.order_by('id')
+        drf_body = JSONRenderer().render(ListingSerializer(queryset, many=True).data)
+        values_body = ORJSONRenderer().render(
+            serialize_values(queryset.values(*ListingSerializer.Meta.fields), ListingSerializer())
+        )
+        self.assertEqual(values_body, drf_body)
+
+        # same through the endpoint, every field asked for
+        fields = ','.join(ListingSerializer.Meta.fields)
+        response = self.client.get(f'/api/listings/?fields={fields}&ordering=price')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertCountEqual(response.json()['results'], json.loads(drf_body))
+
+    def test_benchmark_command_runs(self):
+        make_listing('1')
+        out = StringIO()
+        call_command('benchmark_serializers', rows=10, repeat=1, stdout=out)
+        self.assertIn('values + orjson', out.getvalue())
+
+
+class ConditionalGetTests(ListingTestCase):
+    def test_unchanged_poll_is_304_without_queries(self):
+        make_listing('1')
+
+        for url in ['/api/listings/', '/api/listings/analytics/']:
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+                # other query strings get their own tag
+                other = self.client.get(url + '?ordering=price')
+                self.assertNotEqual(other['ETag'], etag)
+
+                bump_data_version()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'checks sqlite EXPLAIN QUERY PLAN output')
+class QueryPlanTests(ListingTestCase):
+    def test_hot_queries_use_indexes(self):
+        for index in range(20):
+            make_listing(str(index), bedrooms=index % 3 or None, active=index % 4 != 0)
+
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain()
+            table_steps = [line for line in plan.splitlines() if 'listings_listing' in line]
+
+            with self.subTest(name):
+                self.assertTrue(table_steps)
+                for line in table_steps:
+                    self.assertIn('INDEX', line)
+
+    def test_command_runs(self):
+        out = StringIO()
+        call_command('explain_queries', repeat=1, stdout=out)
+        self.assertIn('== list_newest', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'checks postgres EXPLAIN output')
+class PostgresQueryPlanTests(ListingTestCase):
+    # the index each hot query is meant to be served by, see the Meta.indexes comments
+    expected_indexes = {
+        'list_newest': ['listing_active_scraped_idx'],
+        'list_next_page': ['listing_active_scraped_idx'],
+        'rescore_location': ['listing_active_loc_price_idx'],
+        'neighborhood_totals': ['listing_with_details_idx', 'listing_active_loc_price_idx'],
+        # full rows in Meta.ordering order, either the filter or the sort can lead
+        'price_per_sqft': ['listing_with_details_idx', 'listing_active_scraped_idx'],
+        'analytics': ['listing_active_scraped_idx'],
+        'best_value': ['listing_best_value_idx'],
+        'duplicate_check': ['listing_title_loc_price_idx'],
+    }
+
+    def test_hot_queries_use_their_indexes(self):
+        for index in range(20):
+            make_listing(str(index), bedrooms=index % 3 or None, active=index % 4 != 0)
+
+        with connection.cursor() as cursor:
+            # a test sized table is always cheapest to seq scan, so take that away
+            # and check the planner can serve each query from the intended index
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain()
+
+            with self.subTest(name):
+                self.assertNotIn('Seq Scan', plan)
+                self.assertTrue(any(index in plan for index in self.expected_indexes[name]), plan)
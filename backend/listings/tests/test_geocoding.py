@@ -0,0 +1,188 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from .. import geocoding
+from ..local_geocoder import LocalGeocoder, parse_street_address
+from ..models import GeocodeCache, Listing
+from .utils import TESTDATA_DIR, ListingTestCase, StubHandler, StubServerTestCase, make_listing
+
+
+class FakeGeocodeResponse:
+    def __init__(self, results):
+        self.results = results
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'results': self.results}
+
+
+class FakeTomTomTestCase(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.requested = []
+
+        patches = [
+            mock.patch.object(geocoding, 'TOMTOM_API_KEY', 'test-key'),
+            mock.patch.object(geocoding.http_client, 'get', self.fake_get),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def fake_get(self, url):
+        self.requested.append(url)
+
+        if 'Nowhere' in url:
+            return FakeGeocodeResponse([])
+        if 'Broken' in url:
+            raise ConnectionError('down')
+        return FakeGeocodeResponse([{'position': {'lat': 37.76, 'lon': -122.42}}])
+
+
+@override_settings(GEOCODE_NEGATIVE_TTL=30)
+class GeocodeCacheTests(FakeTomTomTestCase):
+    def test_hits_skip_the_request(self):
+        first = geocoding.geocode_address('123 Valencia St Apt 4, San Francisco')
+        second = geocoding.geocode_address('123  valencia st #7, San Francisco')
+
+        self.assertEqual(first, {'lat': 37.76, 'lon': -122.42})
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.requested), 1)
+        self.assertTrue(GeocodeCache.objects.filter(address='123 valencia st, san francisco').exists())
+
+    def test_cache_key_keeps_street_names(self):
+        keys = {
+            address: geocoding.geocode_cache_key(address)
+            for address in ['100 Steiner St', '100 Stevenson St', '100 Unity Ct', '100 St']
+        }
+
+        self.assertEqual(keys['100 Steiner St'], '100 steiner st')
+        self.assertEqual(len(set(keys.values())), 4)
+        self.assertEqual(geocoding.geocode_cache_key('100 Steiner St Ste. 2'), '100 steiner st')
+        self.assertEqual(geocoding.normalize_address('100 Stevenson St Unit 5B'), '100 Stevenson St')
+
+    def test_misses_expire_and_errors_are_not_cached(self):
+        self.assertIsNone(geocoding.geocode_address('1 Nowhere Ln'))
+        self.assertIsNone(geocoding.geocode_address('1 Nowhere Ln'))
+        self.assertEqual(len(self.requested), 1)
+
+        GeocodeCache.objects.update(fetched_at=timezone.now() - timedelta(days=31))
+        geocoding.geocode_address('1 Nowhere Ln')
+        self.assertEqual(len(self.requested), 2)
+
+        geocoding.geocode_address('1 Broken Way')
+        geocoding.geocode_address('1 Broken Way')
+        self.assertEqual(len(self.requested), 4)
+        self.assertFalse(GeocodeCache.objects.filter(address='1 broken way').exists())
+
+
+class MockGeocodeHandler(StubHandler):
+    # TomTom's sync batch endpoint, anything on "Nowhere" has no results
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        queries = [item['query'] for item in body['batchItems']]
+        self.server.requests.append((self.path, queries))
+
+        items = []
+        for query in queries:
+            results = [] if 'Nowhere' in query else [{'position': {'lat': 37.7, 'lon': -122.4}}]
+            items.append({'statusCode': 200, 'response': {'results': results}})
+
+        response = json.dumps({'batchItems': items}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+@override_settings(GEOCODE_BATCH_SIZE=2, GEOCODE_WORKERS=2)
+class BatchGeocodeTests(StubServerTestCase, ListingTestCase):
+    handler_class = MockGeocodeHandler
+
+    def setUp(self):
+        super().setUp()
+
+        patches = [
+            mock.patch.object(geocoding, 'TOMTOM_API_KEY', 'test-key'),
+            mock.patch.object(geocoding, 'TOMTOM_BASE_URL', self.base_url),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_backfill_coords_dedupes_and_batches(self):
+        make_listing('1', address='10 Valencia St Apt 1')
+        make_listing('2', address='10 valencia st #2')
+        make_listing('3', address='20 Mission St')
+        make_listing('4', address='1 Nowhere Ln')
+        make_listing('5', address='30 Cached Ave')
+        GeocodeCache.objects.create(address='30 cached ave', latitude=37.1, longitude=-122.1)
+
+        call_command('backfill_coords', stdout=StringIO())
+
+        batches = sorted(queries for _, queries in self.server.requests)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(sum(len(queries) for queries in batches), 3)
+        self.assertTrue(all(path.startswith('/search/2/batch/sync.json?key=test-key') for path, _ in self.server.requests))
+
+        located = dict(Listing.objects.filter(latitude__isnull=False).values_list('craigslist_id', 'latitude'))
+        self.assertEqual(sorted(located), ['1', '2', '3', '5'])
+        self.assertEqual(float(located['5']), 37.1)
+        self.assertIsNone(GeocodeCache.objects.get(address='1 nowhere ln').latitude)
+
+    def test_failed_batches_are_reported_not_cached(self):
+        make_listing('1', address='20 Mission St')
+
+        out = StringIO()
+        with mock.patch.object(geocoding, 'geocode_batch', side_effect=ConnectionError('tomtom down')):
+            call_command('backfill_coords', stdout=out)
+
+        self.assertIn('Geocoding request failed for 1 listings: tomtom down', out.getvalue())
+        self.assertIn('Failed requests (retried next run): 1', out.getvalue())
+        self.assertFalse(GeocodeCache.objects.exists())
+
+
+@override_settings(LOCAL_GEOCODER_PATH=str(TESTDATA_DIR / 'sf_addresses.csv'))
+class LocalGeocoderTests(FakeTomTomTestCase):
+    def test_parse_street_address(self):
+        self.assertEqual(
+            parse_street_address('123 Valencia Street Apt 4, San Francisco, CA'),
+            ('valencia st', 123),
+        )
+        self.assertEqual(parse_street_address('500 South Van Ness Avenue'), ('s van ness ave', 500))
+        self.assertEqual(parse_street_address('100 Steiner St'), ('steiner st', 100))
+        self.assertEqual(parse_street_address('50 Stevenson St Ste. 300'), ('stevenson st', 50))
+        self.assertEqual(parse_street_address('2000 Webster St Unit 5'), ('webster st', 2000))
+        self.assertEqual(parse_street_address('12 Unity Way'), ('unity way', 12))
+        self.assertIsNone(parse_street_address('Valencia & 16th'))
+
+    def test_lookup_and_interpolation(self):
+        geocoder = LocalGeocoder.from_csv(TESTDATA_DIR / 'sf_addresses.csv')
+
+        self.assertEqual(geocoder.lookup('123 valencia st #2'), {'lat': 37.7676, 'lon': -122.4219})
+
+        between = geocoder.lookup('150 Valencia St')
+        self.assertAlmostEqual(between['lat'], 37.7676 + (37.7660 - 37.7676) * 27 / 77)
+
+        # past the last known number, or an unknown street
+        self.assertIsNone(geocoder.lookup('900 Valencia St'))
+        self.assertIsNone(geocoder.lookup('10 Nowhere Ln'))
+
+    def test_remote_only_on_a_miss(self):
+        self.assertEqual(
+            geocoding.geocode_address('1 Dolores Street, San Francisco'),
+            {'lat': 37.769, 'lon': -122.426},
+        )
+        self.assertEqual(self.requested, [])
+
+        geocoding.geocode_address('77 Elsewhere Blvd')
+        self.assertEqual(len(self.requested), 1)
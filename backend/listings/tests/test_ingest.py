@@ -0,0 +1,258 @@
+import asyncio
+import gzip
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from ..async_scraper import scrape_pipeline, stream_listings_async
+from ..ingest import save_batch, save_listings, stream_listings
+from ..models import Listing, SyncCursor
+from ..neighborhoods import check_neighborhood_stats
+from ..scraper import iter_listings
+from ..sync import sync_changes
+from .utils import ListingTestCase, StubServerTestCase, listing_data, make_listing
+
+
+class StreamingIngestTests(StubServerTestCase, ListingTestCase):
+    def test_stream_from_stub_server(self):
+        listings = iter_listings(search_url=f'{self.base_url}/search', workers=2, rate=1000)
+
+        counts = stream_listings(listings, batch_size=1)
+
+        self.assertEqual(counts, {'created': 2, 'updated': 0, 'skipped': 0})
+        self.assertEqual(Listing.objects.get(craigslist_id='7801000001').location, 'Mission District')
+
+    def test_partial_run_keeps_saved_batches(self):
+        def crashing_scrape():
+            yield {'craigslist_id': '1', 'url': 'u1', 'title': 'Studio', 'price': 2000, 'location': 'soma'}
+            yield {'craigslist_id': '2', 'url': 'u2', 'title': '1BR', 'price': 2500, 'location': 'soma'}
+            raise ConnectionError('scraper died')
+
+        with self.assertRaises(ConnectionError):
+            stream_listings(crashing_scrape(), batch_size=2)
+
+        self.assertEqual(Listing.objects.count(), 2)
+
+
+# the saver runs in a sync_to_async thread on its own connection, so its writes
+# are really committed and have to be flushed between tests
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AsyncStreamingIngestTests(StubServerTestCase, TransactionTestCase):
+    def test_async_pipeline_saves_while_scraping(self):
+        with mock.patch('listings.async_scraper.save_batch', wraps=save_batch) as saver:
+            counts = stream_listings_async(search_url=f'{self.base_url}/search', concurrency=2, rate=1000, batch_size=1)
+
+        self.assertEqual(saver.call_count, 2)
+        self.assertEqual(counts, {'created': 2, 'updated': 0, 'skipped': 0})
+        self.assertEqual(Listing.objects.count(), 2)
+
+    def test_async_pipeline_keeps_saved_batches(self):
+        def save_once(batch):
+            if Listing.objects.exists():
+                raise ConnectionError('db went away')
+            return save_batch(batch)
+
+        with mock.patch('listings.async_scraper.save_batch', side_effect=save_once), \
+                self.assertRaises(ConnectionError):
+            stream_listings_async(search_url=f'{self.base_url}/search', concurrency=2, rate=1000, batch_size=1)
+
+        self.assertEqual(Listing.objects.count(), 1)
+
+    @override_settings(ASYNC_SCRAPE_QUEUE_SIZE=1)
+    def test_failed_save_stops_the_pipeline(self):
+        def broken(batch):
+            raise ConnectionError('db went away')
+
+        # with the saver dead the producers would block on the full queue forever
+        pipeline = scrape_pipeline(
+            search_url=f'{self.base_url}/search', concurrency=2, rate=1000, on_batch=broken, batch_size=1
+        )
+        with self.assertRaises(ConnectionError):
+            asyncio.run(asyncio.wait_for(pipeline, 10))
+
+
+class BulkIngestTests(ListingTestCase):
+    def test_counts_match_row_by_row_semantics(self):
+        make_listing('1', price=2000, latitude=37.76, longitude=-122.42)
+        make_listing('2', title='Sunny studio', price=1900)
+
+        counts = save_listings([
+            listing_data('1', price=2100),
+            listing_data('3', title='Sunny studio', price=1900),
+            listing_data('4'),
+            listing_data('4', price=3100),
+            listing_data('5', title='listing 4', price=3100),
+        ])
+
+        self.assertEqual(counts, {'created': 1, 'updated': 2, 'skipped': 2})
+
+        updated = Listing.objects.get(craigslist_id='1')
+        self.assertEqual(updated.price, 2100)
+        self.assertEqual(float(updated.latitude), 37.76)
+        self.assertEqual(Listing.objects.get(craigslist_id='4').price, 3100)
+        self.assertFalse(Listing.objects.filter(craigslist_id__in=['3', '5']).exists())
+        self.assertEqual(check_neighborhood_stats(), [])
+
+    def test_failed_geocode_keeps_stored_coordinates(self):
+        make_listing('1', latitude=37.78, longitude=-122.4)
+        make_listing('2', latitude=37.78, longitude=-122.4)
+        before = Listing.objects.get(craigslist_id='2').updated_at
+
+        # only the new row got coordinates this run, and only the last row sent bathrooms
+        counts = save_listings([
+            listing_data('3', latitude=37.7, longitude=-122.42),
+            listing_data('2', latitude=None, longitude=None),
+            listing_data('1', latitude=None, longitude=None, bathrooms=2),
+        ])
+
+        self.assertEqual(counts, {'created': 1, 'updated': 2, 'skipped': 0})
+
+        for listing in Listing.objects.filter(craigslist_id__in=['1', '2']):
+            self.assertEqual((float(listing.latitude), float(listing.longitude)), (37.78, -122.4))
+
+        self.assertEqual(Listing.objects.get(craigslist_id='1').bathrooms, 2)
+        self.assertEqual(Listing.objects.get(craigslist_id='2').updated_at, before)
+        self.assertEqual(float(Listing.objects.get(craigslist_id='3').latitude), 37.7)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        with self.assertNumQueries(12):
+            save_listings([listing_data(str(index)) for index in range(5)])
+
+        with self.assertNumQueries(12):
+            save_listings([listing_data(str(index), price=2000 + index) for index in range(20)])
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class DeltaSyncTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sent = []
+
+    def fake_post(self, url, data, headers, timeout):
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        rows = [json.loads(line) for line in gzip.decompress(data.read()).splitlines()]
+        self.sent.append([row['craigslist_id'] for row in rows])
+        return FakeResponse({'created': 0, 'updated': len(rows), 'errors': []})
+
+    def sync(self, **kwargs):
+        self.sent = []
+        with mock.patch('listings.sync.http_client.post', self.fake_post):
+            return sync_changes('http://prod.test', **kwargs)
+
+    @override_settings(SYNC_OVERLAP=0)
+    def test_only_changed_rows_are_sent(self):
+        make_listing('1')
+        make_listing('2')
+        make_listing('3', active=False)
+
+        self.assertEqual(self.sync()['listings'], 2)
+        self.assertIsNotNone(SyncCursor.objects.get(target='http://prod.test').synced_until)
+
+        self.assertEqual(self.sync()['listings'], 0)
+
+        listing = Listing.objects.get(craigslist_id='2')
+        listing.price = 2500
+        listing.save()
+        Listing.objects.get(craigslist_id='1').delete()
+        self.client.post(
+            '/api/listings/mark_inactive/', {'craigslist_ids': ['3']}, content_type='application/json'
+        )
+
+        self.sync(chunk_size=1)
+        self.assertEqual(sorted(self.sent), [['2'], ['3']])
+
+    def test_late_commit_behind_cursor_is_sent(self):
+        make_listing('1')
+        self.sync()
+        synced_until = SyncCursor.objects.get(target='http://prod.test').synced_until
+
+        # stamped before the last run started but only committed after it read
+        make_listing('2')
+        Listing.objects.filter(craigslist_id='2').update(updated_at=synced_until - timedelta(seconds=1))
+
+        self.sync()
+        self.assertIn('2', self.sent[0])
+
+    def test_unchanged_scrape_keeps_updated_at(self):
+        # shaped like a row out of clean_listings_data, floats and all
+        row = listing_data('1', bedrooms=1.0, bathrooms=1.5, address=None, data_quality=50)
+        save_listings([row])
+        before = Listing.objects.get(craigslist_id='1').updated_at
+
+        self.assertEqual(save_listings([dict(row)])['updated'], 1)
+        self.assertEqual(Listing.objects.get(craigslist_id='1').updated_at, before)
+
+        save_listings([dict(row, price=2900)])
+        self.assertGreater(Listing.objects.get(craigslist_id='1').updated_at, before)
+
+    def test_endpoint_accepts_gzip(self):
+        body = gzip.compress(json.dumps([listing_data('1')]).encode())
+
+        response = self.client.post(
+            '/api/listings/bulk_create_listings/', body,
+            content_type='application/json', HTTP_CONTENT_ENCODING='gzip',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+
+
+class StreamedSyncTests(ListingTestCase):
+    def post_stream(self, body, **headers):
+        return self.client.post(
+            '/api/listings/bulk_upsert_stream/', body,
+            content_type='application/x-ndjson', **headers,
+        )
+
+    @override_settings(SYNC_UPSERT_CHUNK_SIZE=2)
+    def test_stream_endpoint_upserts_in_chunks(self):
+        make_listing('1', price=2000)
+        lines = [listing_data(str(index)) for index in range(1, 6)]
+        lines[3]['price'] = 'lots'
+        body = '\n'.join(json.dumps(line) for line in lines).encode()
+
+        response = self.post_stream(gzip.compress(body), HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (3, 1))
+        self.assertEqual([error['index'] for error in response.data['errors']], [3])
+        self.assertEqual(Listing.objects.get(craigslist_id='1').price, 3000)
+        self.assertEqual(check_neighborhood_stats(), [])
+        self.assertGreater(Listing.objects.get(craigslist_id='5').best_value, 0)
+
+    def test_broken_line_keeps_earlier_chunks(self):
+        body = json.dumps(listing_data('1')) + '\n{"craigslist_id": '
+
+        with self.settings(SYNC_UPSERT_CHUNK_SIZE=1):
+            response = self.post_stream(body.encode())
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.data['message'])
+        self.assertTrue(Listing.objects.filter(craigslist_id='1').exists())
+
+    def test_sync_round_trip(self):
+        for index in range(5):
+            make_listing(str(index))
+
+        def forward(url, data, headers, timeout):
+            return self.post_stream(data.read(), HTTP_CONTENT_ENCODING=headers['Content-Encoding'])
+
+        # the "target" is this same db, so every row comes back identical
+        with mock.patch('listings.sync.http_client.post', forward):
+            totals = sync_changes('http://prod.test', chunk_size=2)
+
+        self.assertEqual(
+            (totals['listings'], totals['unchanged'], totals['updated'], totals['created']), (5, 5, 0, 0)
+        )
+        self.assertGreater(totals['bytes'], 0)
@@ -0,0 +1,281 @@
+import numpy as np
+from django.test import TestCase
+
+from ..algorithms import get_best_price_per_sqft, get_good_deals, get_overall_best_value
+from ..analytics import get_neighborhood_stats, get_overall_stats, get_price_distribution
+from ..dashboard import build_analytics
+from ..etl import calculate_quality_score, clean_listings_data, standardize_location
+from ..models import Listing, NeighborhoodStats
+from ..neighborhoods import check_neighborhood_stats, rebuild_neighborhood_stats
+from ..scoring import recompute_scores, round_like_python, top_k
+from .utils import ListingTestCase, make_listing
+
+
+class ETLTests(TestCase):
+    def test_calculate_quality_score_good(self):
+        full_listing = {
+            'title': 'Luxury 1 Bedroom with Parking',
+            'price': 3000,
+            'location': 'pac heights',
+            'url': 'https://url.com',
+            'bedrooms': 1,
+            'bathrooms': 1.0,
+            'sqft': 600,
+            'address': '123 address st',
+            'laundry_type': 'in unit',
+            'parking': 'garage',
+            'cats_allowed': True,
+            'dogs_allowed': True,
+            'latitude': '37.7',
+            'longitude': '-122.4',
+        }
+
+        score = calculate_quality_score(full_listing)
+        self.assertEqual(score, 100)
+        self.assertTrue(score > 85, f'Expected good score for complete data, got {score}')
+
+    def test_calculate_quality_score_bad(self):
+        bad_listing = {
+            'title': 'CHEAP NOT SCAM PLACE',
+            'price': 500,
+            'location': 'Tenderloin',
+            'url': 'https://url.com',
+            'bedrooms': None,
+            'bathrooms': None,
+        }
+
+        score = calculate_quality_score(bad_listing)
+        self.assertTrue(score < 50, f'Expected bad score for missing data, got {score}')
+
+    def test_standardize_location(self):
+        self.assertEqual(standardize_location('fidi'), 'Financial District')
+        self.assertEqual(standardize_location('lower pac heights'), 'Pacific Heights')
+        self.assertEqual(standardize_location('mission'), 'Mission District')
+        self.assertEqual(standardize_location(None), 'Unknown')
+
+    def test_clean_listings_data_outliers(self):
+        raw_data = [
+            # good data
+            {'craigslist_id': '1', 'url': 'u1', 'title': 't1', 'price': 2500, 'location': 'mission'},
+            # dropped - price too low
+            {'craigslist_id': '2', 'url': 'u2', 'title': 'Cheap', 'price': 100, 'location': 'mission'},
+            # dropped - price too high
+            {'craigslist_id': '3', 'url': 'u3', 'title': 'Expensive', 'price': 50000, 'location': 'mission'},
+            # dropped - missing title
+            {'craigslist_id': '4', 'url': 'u4', 'title': None, 'price': 2500, 'location': 'mission'},
+        ]
+
+        cleaned_data = clean_listings_data(raw_data)
+        self.assertEqual(len(cleaned_data), 1)
+        self.assertEqual(cleaned_data[0]['craigslist_id'], '1')
+
+
+class ScoringTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.good = make_listing(
+            '1', price=2000, sqft=1000, bedrooms=2, parking='garage',
+            laundry_type='in_unit', cats_allowed=True, dogs_allowed=True, data_quality=80,
+        )
+        self.pricey = make_listing('2', price=4000, sqft=1000, bedrooms=1, data_quality=50)
+        self.no_sqft = make_listing('3', price=2500, sqft=None)
+
+    def test_recompute_scores_fills_columns(self):
+        self.assertEqual(recompute_scores(), 3)
+
+        self.good.refresh_from_db()
+        self.assertEqual(self.good.price_per_sqft, 2.0)
+        self.assertAlmostEqual(self.good.below_market, 100 - 2000 / 2833.333 * 100, places=2)
+        self.assertAlmostEqual(self.good.best_value, 93)
+
+        self.no_sqft.refresh_from_db()
+        self.assertIsNone(self.no_sqft.price_per_sqft)
+        self.assertEqual(self.no_sqft.best_value, 0)
+
+    def test_overall_best_value_uses_stored_scores(self):
+        recompute_scores()
+
+        best = get_overall_best_value()
+        self.assertEqual([item['id'] for item in best], [self.good.id])
+        self.assertEqual(best[0]['total_score'], 93.0)
+        self.assertEqual(best[0]['details'], {
+            'price_per_sqft': 2.0,
+            'percent_of_avg': 70.6,
+            'price_per_bedroom': 1000.0,
+            'amenity_score': 15,
+        })
+
+    def test_recompute_only_touches_given_locations(self):
+        other = make_listing('4', price=2000, sqft=1000, bedrooms=2, location='SoMa')
+
+        recompute_scores({'SoMa'})
+
+        self.good.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.good.best_value, 0)
+        self.assertGreater(other.best_value, 0)
+
+
+class VectorizedScoringTests(ListingTestCase):
+    def test_top_k_keeps_ties_in_original_order(self):
+        keys = np.array([3.0, 1.0, 2.0, 1.0, 2.0, 5.0])
+        self.assertEqual(list(top_k(keys, 3)), [1, 3, 2])
+        self.assertEqual(list(top_k(keys, 10)), [1, 3, 2, 4, 0, 5])
+
+    def test_round_like_python(self):
+        values = np.array([1535 / 1000, 2.675, 1.005, 3.14159])
+        self.assertEqual(list(round_like_python(values, 2)), [round(float(v), 2) for v in values])
+
+    def test_good_deals(self):
+        make_listing('1', price=2000)
+        make_listing('2', price=4000)
+        make_listing('3', price=2400)
+        make_listing('4', price=1000, bedrooms=None)
+
+        deals = get_good_deals()
+        self.assertEqual([deal['price'] for deal in deals], [2000, 2400])
+        self.assertEqual(deals[0]['avg_price'], 2800.0)
+        self.assertEqual(deals[0]['savings'], 800.0)
+        self.assertEqual(deals[0]['savings_percent'], 28.6)
+
+    def test_best_price_per_sqft(self):
+        make_listing('1', price=3000, sqft=1000)
+        make_listing('2', price=1535, sqft=1000, bathrooms=1.5)
+        make_listing('3', price=1000, sqft=1000)
+        make_listing('4', price=2000, sqft=0)
+
+        deals = get_best_price_per_sqft()
+        self.assertEqual([deal['price_per_sqft'] for deal in deals], [1.53, 3.0])
+        self.assertEqual(deals[0]['bathrooms'], 1.5)
+        self.assertIsNone(deals[1]['bathrooms'])
+
+
+class DashboardTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        make_listing(
+            '1', price=2000, sqft=1000, bedrooms=2, bathrooms=1, address='1 Main St',
+            parking='garage', laundry_type='in_unit', data_quality=80,
+        )
+        make_listing('2', price=4000, sqft=1000, bedrooms=1, data_quality=50)
+        make_listing('3', price=2500, sqft=None, location='SoMa')
+        make_listing('4', price=1800, bedrooms=None, location='SoMa')
+        make_listing('5', price=1200, active=False)
+        recompute_scores()
+
+    def test_matches_individual_sections(self):
+        analytics = build_analytics()
+
+        self.assertEqual(analytics['overall'], get_overall_stats())
+        self.assertEqual(
+            sorted(analytics['neighborhoods'], key=lambda stat: stat['location']),
+            sorted(get_neighborhood_stats(), key=lambda stat: stat['location']),
+        )
+        self.assertEqual(analytics['price_distribution'], get_price_distribution())
+        self.assertEqual(analytics['good_deals'], get_good_deals())
+        self.assertEqual(analytics['best_price_per_sqft'], get_best_price_per_sqft())
+        self.assertEqual(analytics['overall_best_value'], get_overall_best_value())
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            build_analytics()
+
+
+class PriceDistributionTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        make_listing('1', price=1200, bedrooms=1)
+        make_listing('2', price=3200, bedrooms=2)
+        make_listing('3', price=3400, bedrooms=2, location='SoMa')
+        make_listing('4', price=9000, bedrooms=3, active=False)
+
+    def test_single_query_includes_3000_3500(self):
+        with self.assertNumQueries(1):
+            distribution = get_price_distribution()
+
+        counts = {bucket['range']: bucket['count'] for bucket in distribution}
+        self.assertEqual(counts['$1-$1500'], 1)
+        self.assertEqual(counts['$3000-$3500'], 2)
+        self.assertEqual(counts['$5000-$10000'], 0)
+
+    def test_custom_edges(self):
+        distribution = get_price_distribution(edges=[0, 2000, 5000])
+        self.assertEqual(distribution, [
+            {'range': '$0-$2000', 'count': 1},
+            {'range': '$2000-$5000', 'count': 2},
+        ])
+
+    def test_segmented(self):
+        with self.assertNumQueries(1):
+            by_bedrooms = get_price_distribution(edges=[0, 2000, 5000], segment_by='bedrooms')
+
+        self.assertEqual(by_bedrooms, [
+            {'bedrooms': 1, 'distribution': [
+                {'range': '$0-$2000', 'count': 1},
+                {'range': '$2000-$5000', 'count': 0},
+            ]},
+            {'bedrooms': 2, 'distribution': [
+                {'range': '$0-$2000', 'count': 0},
+                {'range': '$2000-$5000', 'count': 2},
+            ]},
+        ])
+
+        with self.assertRaises(ValueError):
+            get_price_distribution(segment_by='title')
+
+
+class NeighborhoodStatsTests(ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cheap = make_listing('1', price=2000, sqft=800)
+        self.pricey = make_listing('2', price=4000, sqft=None, bedrooms=2)
+        make_listing('3', price=1000, bedrooms=None)
+
+    def assertConsistent(self):
+        self.assertEqual(check_neighborhood_stats(), [])
+
+    def test_created_listings_update_totals(self):
+        stats = NeighborhoodStats.objects.get(location='Mission District')
+        self.assertEqual(stats.listing_count, 2)
+        self.assertEqual(stats.avg_price, 3000)
+        self.assertEqual(stats.median_bedrooms, 1.5)
+        self.assertEqual((stats.min_price, stats.max_price), (2000, 4000))
+        self.assertEqual(stats.avg_sqft, 800)
+        self.assertConsistent()
+
+    def test_reprice_and_move(self):
+        self.cheap.price = 2500
+        self.cheap.save()
+        self.assertEqual(NeighborhoodStats.objects.get(location='Mission District').min_price, 2500)
+
+        self.pricey.location = 'SoMa'
+        self.pricey.save()
+        self.assertEqual(NeighborhoodStats.objects.get(location='SoMa').avg_price, 4000)
+        self.assertEqual(NeighborhoodStats.objects.get(location='Mission District').max_price, 2500)
+        self.assertConsistent()
+
+    def test_inactive_and_delete(self):
+        listing = Listing.objects.get(craigslist_id='2')
+        listing.active = False
+        listing.save()
+        self.assertEqual(NeighborhoodStats.objects.get(location='Mission District').listing_count, 1)
+
+        Listing.objects.get(craigslist_id='1').delete()
+        self.assertEqual(NeighborhoodStats.objects.get(location='Mission District').listing_count, 0)
+        self.assertConsistent()
+
+    def test_mark_inactive_endpoint(self):
+        self.client.post(
+            '/api/listings/mark_inactive/',
+            {'craigslist_ids': ['1']},
+            content_type='application/json',
+        )
+        self.assertEqual(NeighborhoodStats.objects.get(location='Mission District').listing_count, 1)
+        self.assertConsistent()
+
+    def test_rebuild_repairs_drift(self):
+        NeighborhoodStats.objects.filter(location='Mission District').update(listing_count=7)
+        self.assertEqual(check_neighborhood_stats(), ['Mission District'])
+
+        rebuild_neighborhood_stats()
+        self.assertConsistent()
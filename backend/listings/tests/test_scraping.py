@@ -0,0 +1,296 @@
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from .. import http_client
+from ..async_scraper import scrape_list_urls_async
+from ..cache import bump_data_version
+from ..detail_scraper import fetch_listing_details
+from ..management.commands.backfill_details import write_checkpoint
+from ..models import Listing
+from ..neighborhoods import check_neighborhood_stats
+from ..refresh import check_interval, get_due_listings, schedule_next_check
+from ..scoring import recompute_scores
+from ..scraper import scrape_list_urls
+from ..throttle import RateLimiter
+from .utils import (
+    FlakyHandler, ListingTestCase, StubCraigslistHandler, StubServerTestCase, make_listing,
+)
+
+
+class ConcurrentScraperTests(StubServerTestCase):
+    def test_scrape_list_urls_with_worker_pool(self):
+        listings = scrape_list_urls(search_url=f'{self.base_url}/search', workers=4, rate=1000)
+
+        # flagged listing is dropped, order is kept
+        self.assertEqual([listing['craigslist_id'] for listing in listings], ['7801000001', '7801000002'])
+
+        sunny = listings[0]
+        self.assertEqual(sunny['price'], 3200)
+        self.assertEqual(sunny['bedrooms'], 2)
+        self.assertEqual(sunny['bathrooms'], 1.5)
+        self.assertEqual(sunny['sqft'], 950)
+        self.assertEqual(sunny['address'], '3500 19th St Apt 4')
+        self.assertTrue(sunny['cats_allowed'] and sunny['dogs_allowed'])
+        self.assertEqual(sunny['laundry_type'], 'in_unit')
+        self.assertEqual(sunny['parking'], 'garage')
+        self.assertEqual(sunny['extra_amenities'], 'dishwasher')
+
+        studio = listings[1]
+        self.assertEqual(studio['laundry_type'], 'on_site')
+        self.assertEqual(studio['parking'], 'street')
+
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_async_pipeline_matches_threaded_scraper(self):
+        threaded = scrape_list_urls(search_url=f'{self.base_url}/search', workers=4, rate=1000)
+        pipelined = scrape_list_urls_async(search_url=f'{self.base_url}/search', concurrency=4, rate=1000)
+
+        key = lambda listing: listing['craigslist_id']
+        self.assertEqual(sorted(pipelined, key=key), sorted(threaded, key=key))
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(rate=20)
+
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+
+        # first token is free, the other four wait 1/20s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+@override_settings(HTTP_BACKOFF=0, HTTP_BACKOFF_JITTER=0)
+class HttpClientTests(StubServerTestCase):
+    handler_class = FlakyHandler
+
+    def setUp(self):
+        super().setUp()
+        http_client.close_sessions()
+
+    def test_retries_5xx(self):
+        response = http_client.get(f'{self.base_url}/flaky')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, ['/flaky'] * 3)
+
+    @override_settings(HTTP_RETRIES=1)
+    def test_gives_up_after_retries(self):
+        response = http_client.get(f'{self.base_url}/down')
+        self.assertEqual(response.status_code, 503)
+
+    def test_one_session_per_host(self):
+        first = http_client.get_session(f'{self.base_url}/a')
+        self.assertIs(first, http_client.get_session(f'{self.base_url}/b'))
+        self.assertIsNot(first, http_client.get_session('https://api.tomtom.com/search'))
+
+
+class ConditionalHandler(StubCraigslistHandler):
+    # only the first listing sends an etag, the other one has to be hashed
+    def send_header(self, keyword, value):
+        super().send_header(keyword, value)
+
+        if keyword == 'Content-Type' and self.path.endswith('7801000001.html'):
+            super().send_header('ETag', '"v1"')
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.server.requests.append(self.path)
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        super().do_GET()
+
+
+class ConditionalRefreshTests(StubServerTestCase, ListingTestCase):
+    handler_class = ConditionalHandler
+
+    def update_listings(self):
+        out = StringIO()
+        # no production sync from tests
+        with mock.patch('listings.management.commands.update_listings.time.sleep'), \
+                mock.patch.dict('os.environ', {'PRODUCTION_API_URL': ''}):
+            call_command('update_listings', stdout=out)
+        return out.getvalue()
+
+    def test_second_run_skips_unchanged_pages(self):
+        for craigslist_id in ['7801000001', '7801000002']:
+            make_listing(craigslist_id, url=f'{self.base_url}/sfc/apa/d/x/{craigslist_id}.html')
+
+        self.assertIn('Changed: 2', self.update_listings())
+
+        first = Listing.objects.get(craigslist_id='7801000001')
+        second = Listing.objects.get(craigslist_id='7801000002')
+        self.assertEqual(first.etag, '"v1"')
+        self.assertEqual(len(second.content_hash), 64)
+        self.assertIsNotNone(first.next_check_at)
+
+        # make them due again
+        Listing.objects.update(next_check_at=None)
+        output = self.update_listings()
+
+        self.assertIn('Unchanged: 2 (2 not modified)', output)
+        self.assertEqual(Listing.objects.get(craigslist_id='7801000001').updated_at, first.updated_at)
+        self.assertEqual(Listing.objects.get(craigslist_id='7801000002').updated_at, second.updated_at)
+
+    @override_settings(REFRESH_PUBLISH_EVERY=1)
+    def test_changes_are_published_during_the_run(self):
+        for craigslist_id in ['7801000001', '7801000002']:
+            make_listing(craigslist_id, url=f'{self.base_url}/sfc/apa/d/x/{craigslist_id}.html')
+
+        with mock.patch(
+            'listings.management.commands.update_listings.bump_data_version', wraps=bump_data_version
+        ) as bump:
+            self.update_listings()
+
+        # once per changed listing, nothing left over for the end of the run
+        self.assertEqual(bump.call_count, 2)
+
+
+class StatusHandler(FlakyHandler):
+    # answers with the status in the file name, /x/503.html is always a 503
+    # however many times it's retried
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.send_response(int(self.path.rsplit('/', 1)[-1].split('.')[0]))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@override_settings(HTTP_RETRIES=1, HTTP_BACKOFF=0, HTTP_BACKOFF_JITTER=0)
+class FailedRefreshTests(StubServerTestCase, ListingTestCase):
+    handler_class = StatusHandler
+
+    def setUp(self):
+        super().setUp()
+        http_client.close_sessions()
+        self.addCleanup(http_client.close_sessions)
+
+    def test_fetch_status_by_response(self):
+        statuses = {
+            code: fetch_listing_details(f'{self.base_url}/sfc/apa/d/x/{code}.html')['status']
+            for code in (404, 410, 503)
+        }
+        self.assertEqual(statuses, {404: 'removed', 410: 'removed', 503: 'error'})
+
+    def test_gone_listing_deactivated_failed_one_rescheduled(self):
+        for code in ('404', '410', '503'):
+            make_listing(code, url=f'{self.base_url}/sfc/apa/d/x/{code}.html')
+
+        out = StringIO()
+        with mock.patch('listings.management.commands.update_listings.time.sleep'), \
+                mock.patch.dict('os.environ', {'PRODUCTION_API_URL': ''}):
+            call_command('update_listings', stdout=out)
+
+        self.assertIn('Failed (rescheduled): 1', out.getvalue())
+        self.assertIn('New inactive: 2', out.getvalue())
+
+        active = dict(Listing.objects.values_list('craigslist_id', 'active'))
+        self.assertEqual(active, {'404': False, '410': False, '503': True})
+        self.assertGreater(Listing.objects.get(craigslist_id='503').next_check_at, timezone.now())
+
+
+@override_settings(REFRESH_BASE_HOURS=12, REFRESH_MIN_HOURS=2, REFRESH_MAX_HOURS=168)
+class RefreshScheduleTests(ListingTestCase):
+    def test_interval_favours_fresh_changing_good_deals(self):
+        now = timezone.now()
+        fresh = Listing(scraped_at=now, change_count=5, best_value=90)
+        stale = Listing(scraped_at=now - timedelta(days=90), change_count=0, best_value=10)
+
+        self.assertEqual(check_interval(fresh, now), timedelta(hours=2))
+        self.assertEqual(check_interval(stale, now), timedelta(hours=168))
+        self.assertLess(
+            check_interval(Listing(scraped_at=now, change_count=0, best_value=90), now),
+            check_interval(Listing(scraped_at=now, change_count=0, best_value=10), now),
+        )
+
+    def test_due_listings_order_and_limit(self):
+        now = timezone.now()
+        make_listing('later', next_check_at=now + timedelta(hours=1))
+        make_listing('overdue', next_check_at=now - timedelta(hours=1))
+        make_listing('very_overdue', next_check_at=now - timedelta(days=1))
+        make_listing('never')
+
+        due = [listing.craigslist_id for listing in get_due_listings(limit=3, now=now)]
+        self.assertEqual(due, ['never', 'very_overdue', 'overdue'])
+
+        listing = Listing.objects.get(craigslist_id='never')
+        listing.save(update_fields=schedule_next_check(listing, changed=True, now=now))
+        listing.refresh_from_db()
+        self.assertEqual(listing.change_count, 1)
+        self.assertGreater(listing.next_check_at, now)
+
+
+class BackfillDetailsTests(StubServerTestCase, ListingTestCase):
+    def setUp(self):
+        super().setUp()
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint = Path(checkpoint_dir.name) / 'backfill_details'
+
+        for craigslist_id in ['7801000001', '7801000002', '7801000003']:
+            make_listing(
+                craigslist_id,
+                url=f'{self.base_url}/sfc/apa/d/x/{craigslist_id}.html',
+                bedrooms=None,
+                sqft=None,
+            )
+
+    def backfill(self):
+        call_command(
+            'backfill_details', workers=2, rate=1000, batch_size=2,
+            checkpoint=str(self.checkpoint), stdout=StringIO(),
+        )
+
+    def test_backfills_in_batches(self):
+        self.backfill()
+
+        first = Listing.objects.get(craigslist_id='7801000001')
+        self.assertEqual((first.bedrooms, first.sqft, first.parking), (2, 950, 'garage'))
+        self.assertEqual(Listing.objects.get(craigslist_id='7801000002').bedrooms, 0)
+        self.assertFalse(Listing.objects.get(craigslist_id='7801000003').active)
+        self.assertEqual(check_neighborhood_stats(), [])
+        self.assertGreater(first.best_value, 0)
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_resumes_after_checkpoint(self):
+        first = Listing.objects.get(craigslist_id='7801000001')
+        self.checkpoint.write_text(str(first.id))
+
+        self.backfill()
+
+        self.assertIsNone(Listing.objects.get(craigslist_id='7801000001').bedrooms)
+        self.assertEqual(Listing.objects.get(craigslist_id='7801000002').bedrooms, 0)
+
+    def test_failed_fetch_is_not_checkpointed_past(self):
+        # the fetch fails outright, the listing is still there as far as we know
+        missing = make_listing('missing', url=f'{self.base_url}/sfc/apa/d/x/missing.html', bedrooms=None)
+        get = http_client.get
+
+        def unreachable(url, **kwargs):
+            if 'missing' in url:
+                raise ConnectionError('connection reset')
+            return get(url, **kwargs)
+
+        with mock.patch('listings.detail_scraper.http_client.get', unreachable), mock.patch(
+            'listings.management.commands.backfill_details.write_checkpoint', wraps=write_checkpoint
+        ) as checkpoint, mock.patch(
+            'listings.management.commands.backfill_details.recompute_scores', wraps=recompute_scores
+        ) as rescore:
+            self.backfill()
+
+        ids = list(Listing.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual([call.args[1] for call in checkpoint.call_args_list], [ids[1], missing.id - 1])
+        self.assertEqual(rescore.call_count, 2)
+
+        missing.refresh_from_db()
+        self.assertTrue(missing.active)
+        self.assertIsNone(missing.bedrooms)
@@ -0,0 +1,56 @@
+import asyncio, threading, time
+
+
+class RateLimiter:
+    """
+    token bucket shared by every worker thread
+    rate is requests per second, burst is how many can go back to back
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class AsyncRateLimiter:
+    """
+    same token bucket for the asyncio pipeline, waiters queue up on the lock
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
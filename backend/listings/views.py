@@ -1,21 +1,51 @@
+from django.conf import settings
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Listing
-from .serializers import ListingSerializer
-from .analytics import (
-    get_neighborhood_stats,
-    get_price_distribution,
-    get_overall_stats
-)
-from .algorithms import (
-    get_good_deals,
-    get_best_price_per_sqft,
-    get_overall_best_value,
-    )
+from .serializers import ListingSerializer, ListingListSerializer, ListingUpsertSerializer, serialize_values
+from .dashboard import build_analytics
+from .analytics import get_price_distribution, DISTRIBUTION_SEGMENTS
+from .scoring import recompute_scores
+from .neighborhoods import rebuild_neighborhood_stats
+from .cache import get_or_compute, bump_data_version, data_etag
+from .ingest import upsert_listings, batched
+from .parsers import GzipJSONParser, NDJSONParser
+from .pagination import ListingCursorPagination
+from .renderers import ORJSONRenderer
+
+def validate_listing_rows(items, start=0):
+    """
+    validates incoming rows one at a time so one bad row doesn't sink the batch
+    returns (validated rows, errors keyed by the row's index in the payload)
+    """
+    rows = []
+    errors = []
+
+    for index, item in enumerate(items, start):
+        serializer = ListingUpsertSerializer(data=item)
+
+        if serializer.is_valid():
+            rows.append(serializer.validated_data)
+        else:
+            errors.append({
+                'index': index,
+                'craigslist_id': item.get('craigslist_id') if isinstance(item, dict) else None,
+                'errors': serializer.errors,
+            })
+
+    return rows, errors
 
 # gets data from database, converts to JSON format
+# conditional GET, If-None-Match on an unchanged data version is a 304 before any query runs
+@method_decorator(condition(etag_func=data_etag), name='list')
+@method_decorator(condition(etag_func=data_etag), name='retrieve')
 class ListingViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Listing.objects.filter(active=True).order_by('-scraped_at')
     serializer_class = ListingSerializer
@@ -38,41 +68,110 @@ class ListingViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['price', 'scraped_at', 'bedrooms', 'bathrooms']
     ordering = ['-scraped_at']
 
+    # keyset pages on the ordering above plus id, see pagination.py
+    pagination_class = ListingCursorPagination
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def get_requested_fields(self):
+        # ?fields=id,price,latitude limits both the columns loaded and the keys returned
+        requested = self.request.query_params.get('fields')
+        if not requested:
+            return None
+
+        fields = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in ListingSerializer.Meta.fields]
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown field: {name}' for name in unknown]})
+
+        return fields
+
+    def get_fields(self):
+        # fields the response will hold, the slim list ones unless asked otherwise
+        if self.action not in ('list', 'retrieve'):
+            return None
+
+        fields = self.get_requested_fields()
+        if fields is None and self.action == 'list':
+            fields = ListingListSerializer.Meta.fields
+
+        return fields
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.get_requested_fields() is None:
+            return ListingListSerializer
+        return ListingSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields() if self.action in ('list', 'retrieve') else None
+        return context
+
+    def get_columns(self, queryset, fields):
+        # the ordering column has to come along too, the paginator reads it off the last row
+        ordering = filters.OrderingFilter().get_ordering(self.request, queryset, self) or self.ordering
+        return set(fields) | {name.lstrip('-') for name in ordering} | {'id'}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        fields = self.get_fields()
+        if fields is None:
+            return queryset
+
+        return queryset.only(*self.get_columns(queryset, fields))
+
+    def list(self, request, *args, **kwargs):
+        # read only, so skip model instances and go straight from values() rows to json
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values(*self.get_columns(queryset, self.get_fields()))
+
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialize_values(page, self.get_serializer()))
+
     @action(detail=False, methods=['get'])
+    @method_decorator(condition(etag_func=data_etag))
     def analytics(self, request):
-        return Response({
-            'overall': get_overall_stats(),
-            'neighborhoods': get_neighborhood_stats(),
-            'price_distribution': get_price_distribution(),
-            'good_deals': get_good_deals(),
-            'best_price_per_sqft': get_best_price_per_sqft(),
-            'overall_best_value': get_overall_best_value(),
-        })
+        # ?distribution_by=location or bedrooms adds a histogram per segment
+        # checked first so a bad value doesn't build the whole payload just to be rejected
+        segment_by = request.query_params.get('distribution_by')
+        if segment_by and segment_by not in DISTRIBUTION_SEGMENTS:
+            return Response({
+                'status': 'error',
+                'message': f"distribution_by must be one of {', '.join(DISTRIBUTION_SEGMENTS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        analytics = get_or_compute('listings:analytics', build_analytics)
+
+        if segment_by:
+            analytics[f'price_distribution_by_{segment_by}'] = get_or_compute(
+                f'listings:price_distribution:{segment_by}',
+                lambda: get_price_distribution(segment_by=segment_by)
+            )
+
+        return Response(analytics)
     
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], parser_classes=[GzipJSONParser])
     def bulk_create_listings(self, request):
         try:
             listings_data = request.data
-            
-            created_count = 0
-            updated_count = 0
-
-            for item in listings_data:
-                item.pop('id', None)
-
-                listing, was_created = Listing.objects.update_or_create(
-                    craigslist_id=item['craigslist_id'],
-                    defaults=item
-                )
-                if was_created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-            
+
+            if not isinstance(listings_data, list):
+                return Response({
+                    'status': 'Error',
+                    'message': 'expected a list of listings'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # bad rows are reported back by index, the rest still get saved
+            rows, errors = validate_listing_rows(listings_data)
+
+            counts = upsert_listings(rows) if rows else {'created': 0, 'updated': 0, 'unchanged': 0}
+
             return Response({
                 'status': 'Success',
-                'created': created_count,
-                'updated': updated_count,
+                'created': counts['created'],
+                'updated': counts['updated'],
+                'unchanged': counts['unchanged'],
+                'errors': errors,
             })
         except Exception as e:
             return Response({
@@ -80,14 +179,64 @@ class ListingViewSet(viewsets.ReadOnlyModelViewSet):
                 'message': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
+    @action(detail=False, methods=['post'], parser_classes=[NDJSONParser])
+    def bulk_upsert_stream(self, request):
+        """
+        same as bulk_create_listings but for a (usually gzipped) NDJSON body
+        rows are read off the stream and upserted chunk by chunk, so memory stays
+        flat however many rows are sent. chunks already applied stay applied if
+        the stream turns out to be broken part way
+        """
+        totals = {'created': 0, 'updated': 0, 'unchanged': 0}
+        errors = []
+        locations = set()
+
+        try:
+            start = 0
+            for chunk in batched(request.data, settings.SYNC_UPSERT_CHUNK_SIZE):
+                rows, chunk_errors = validate_listing_rows(chunk, start)
+                start += len(chunk)
+                errors.extend(chunk_errors)
+
+                if rows:
+                    counts = upsert_listings(rows, rescore=False)
+                    totals['created'] += counts['created']
+                    totals['updated'] += counts['updated']
+                    totals['unchanged'] += counts['unchanged']
+                    locations |= counts['locations']
+
+            response_status = status.HTTP_200_OK
+            message = None
+        except ParseError as e:
+            response_status = status.HTTP_400_BAD_REQUEST
+            message = str(e.detail)
+        finally:
+            # once per request, not once per chunk
+            if locations:
+                recompute_scores(locations)
+                bump_data_version()
+
+        return Response({
+            'status': 'Success' if message is None else 'Error',
+            'message': message,
+            'created': totals['created'],
+            'updated': totals['updated'],
+            'unchanged': totals['unchanged'],
+            'errors': errors,
+        }, status=response_status)
+
     @action(detail=False, methods=['post'])
     def mark_inactive(self, request):
         try:
             craigslist_ids = request.data.get('craigslist_ids', [])
 
-            updated = Listing.objects.filter(
-                craigslist_id__in=craigslist_ids
-            ).update(active=False)
+            listings = Listing.objects.filter(craigslist_id__in=craigslist_ids)
+            locations = set(listings.values_list('location', flat=True))
+
+            updated = listings.update(active=False, updated_at=timezone.now())
+            rebuild_neighborhood_stats(locations)
+            recompute_scores(locations)
+            bump_data_version()
 
             return Response({
                 'status': 'success',
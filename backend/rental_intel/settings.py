@@ -159,6 +159,90 @@ CORS_ALLOWED_ORIGINS = os.getenv(
     'http://localhost:5173'
 ).split(',')
 
+# Cache
+# analytics are cached until the next ingest bumps the data version (see listings/cache.py)
+# file based by default so gunicorn workers and celery share it, redis if CACHE_REDIS_URL is set
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / '.cache')),
+        }
+    }
+
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Scraper
+# detail pages are fetched by SCRAPE_WORKERS threads but never faster than
+# SCRAPE_RATE requests/second, 0.25 matches the old 3-5s sleep between pages
+SCRAPE_WORKERS = int(os.getenv('SCRAPE_WORKERS', 4))
+SCRAPE_RATE = float(os.getenv('SCRAPE_RATE', 0.25))
+
+# update_listings re-checks at most REFRESH_BATCH_SIZE overdue listings per run
+# and stops starting new ones after REFRESH_TIME_BUDGET seconds, each listing
+# waits between REFRESH_MIN_HOURS and REFRESH_MAX_HOURS before its next check
+REFRESH_BATCH_SIZE = int(os.getenv('REFRESH_BATCH_SIZE', 200))
+REFRESH_TIME_BUDGET = int(os.getenv('REFRESH_TIME_BUDGET', 30 * 60))
+REFRESH_BASE_HOURS = float(os.getenv('REFRESH_BASE_HOURS', 12))
+REFRESH_MIN_HOURS = float(os.getenv('REFRESH_MIN_HOURS', 2))
+REFRESH_MAX_HOURS = float(os.getenv('REFRESH_MAX_HOURS', 24 * 7))
+# changed/removed listings are rescored and published (data version bump) every this many checks
+REFRESH_PUBLISH_EVERY = int(os.getenv('REFRESH_PUBLISH_EVERY', 25))
+
+# backfill_details, detail pages per second across all workers, rows per
+# bulk_update, and where it remembers the last id it finished
+BACKFILL_RATE = float(os.getenv('BACKFILL_RATE', 1))
+BACKFILL_BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', 50))
+BACKFILL_CHECKPOINT = os.getenv('BACKFILL_CHECKPOINT', str(BASE_DIR / '.checkpoints' / 'backfill_details'))
+
+# scraped listings are cleaned and saved in batches of this size as they come in
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 10))
+
+# asyncio pipeline (listings/async_scraper.py), detail fetches in flight and
+# max listings waiting between stages
+ASYNC_SCRAPE_CONCURRENCY = int(os.getenv('ASYNC_SCRAPE_CONCURRENCY', 8))
+ASYNC_SCRAPE_QUEUE_SIZE = int(os.getenv('ASYNC_SCRAPE_QUEUE_SIZE', 32))
+
+# TomTom allows 5 requests/second
+GEOCODE_RATE = float(os.getenv('GEOCODE_RATE', 5))
+GEOCODE_WORKERS = int(os.getenv('GEOCODE_WORKERS', 2))
+# addresses the geocoder couldn't place are retried after this many days
+GEOCODE_NEGATIVE_TTL = int(os.getenv('GEOCODE_NEGATIVE_TTL', 30))
+# csv of address,latitude,longitude points (e.g. an export of SF's address
+# points), when set addresses are looked up there before going to TomTom
+LOCAL_GEOCODER_PATH = os.getenv('LOCAL_GEOCODER_PATH')
+# addresses per TomTom batch request (sync batches take up to 100)
+GEOCODE_BATCH_SIZE = int(os.getenv('GEOCODE_BATCH_SIZE', 100))
+GEOCODE_BATCH_TIMEOUT = float(os.getenv('GEOCODE_BATCH_TIMEOUT', 60))
+
+# Outgoing HTTP (scraper, detail scraper, geocoder), see listings/http_client.py
+# 429/5xx responses are retried with exponential backoff plus jitter
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 3))
+HTTP_BACKOFF = float(os.getenv('HTTP_BACKOFF', 1))
+HTTP_BACKOFF_JITTER = float(os.getenv('HTTP_BACKOFF_JITTER', 0.5))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+
+# production sync (listings/sync.py), rows per streamed POST and how long to wait on each
+SYNC_CHUNK_SIZE = int(os.getenv('SYNC_CHUNK_SIZE', 5000))
+SYNC_READ_TIMEOUT = float(os.getenv('SYNC_READ_TIMEOUT', 60))
+# seconds behind the cursor every sync re-reads, covers writes that commit after their updated_at
+SYNC_OVERLAP = int(os.getenv('SYNC_OVERLAP', 300))
+# receiving side, rows read off an NDJSON stream per upsert
+SYNC_UPSERT_CHUNK_SIZE = int(os.getenv('SYNC_UPSERT_CHUNK_SIZE', 500))
+
+# listing list endpoint, rows per page and the most a client can ask for with ?page_size=
+LISTINGS_PAGE_SIZE = int(os.getenv('LISTINGS_PAGE_SIZE', 50))
+LISTINGS_MAX_PAGE_SIZE = int(os.getenv('LISTINGS_MAX_PAGE_SIZE', 500))
+
 # Celery Config
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')  # where tasks are stored
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import api from "../api/client";
 
 function ListingTable() {
@@ -7,6 +7,11 @@ function ListingTable() {
   const [error, setError] = useState(null);
   const [expandedId, setExpandedId] = useState(null);
 
+  // the list endpoint is cursor paginated, nextUrl is the next page or null at the end
+  const [nextUrl, setNextUrl] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const sentinelRef = useRef(null);
+
   const [minPrice, setMinPrice] = useState("");
   const [maxPrice, setMaxPrice] = useState("");
   const [location, setLocation] = useState("");
@@ -49,13 +54,42 @@ function ListingTable() {
       if (parkingType) params.parking = parkingType;
 
       const response = await api.get("/listings/", { params });
-      setListings(response.data);
+      setListings(response.data.results);
+      setNextUrl(response.data.next);
     } catch (err) {
       setError(err.message);
       console.error("Error fetching listings:", err);
     }
   };
 
+  const fetchMore = async () => {
+    if (!nextUrl || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      // next already carries the filters, ordering and cursor
+      const response = await api.get(nextUrl);
+      setListings((prev) => [...prev, ...response.data.results]);
+      setNextUrl(response.data.next);
+    } catch (err) {
+      console.error("Error fetching more listings:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // infinite scroll, load the next page once the bottom of the table comes into view
+  useEffect(() => {
+    if (!nextUrl || !sentinelRef.current) return;
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries[0].isIntersecting) fetchMore();
+      },
+      { rootMargin: "400px" }
+    );
+    observer.observe(sentinelRef.current);
+    return () => observer.disconnect();
+  }, [nextUrl, loadingMore]);
+
   const handleClearFilters = () => {
     setMinPrice("");
     setMaxPrice("");
@@ -69,8 +103,22 @@ function ListingTable() {
     setParkingType("");
   };
 
+  // list rows are slim, the expanded row pulls the full listing once
+  const [detailIds, setDetailIds] = useState(new Set());
+
+  const fetchDetails = async (id) => {
+    try {
+      const response = await api.get(`/listings/${id}/`);
+      setListings((prev) => prev.map((listing) => (listing.id === id ? { ...listing, ...response.data } : listing)));
+      setDetailIds((prev) => new Set(prev).add(id));
+    } catch (err) {
+      console.error("Error fetching listing details:", err);
+    }
+  };
+
   const toggleExpand = (id) => {
     setExpandedId(expandedId === id ? null : id);
+    if (expandedId !== id && !detailIds.has(id)) fetchDetails(id);
   };
 
   if (initialLoading)
@@ -226,7 +274,10 @@ function ListingTable() {
         </div>
 
         {/* listings table */}
-        <p className="text-sm text-gray-600 mb-4">Found {listings.length} listings</p>
+        <p className="text-sm text-gray-600 mb-4">
+          Showing {listings.length}
+          {nextUrl ? "+" : ""} listings
+        </p>
         <div className="bg-white rounded-lg shadow-sm overflow-hidden">
           {listings.length === 0 ? (
             <div className="text-center py-12">
@@ -285,48 +336,52 @@ function ListingTable() {
                     {expandedId === listing.id && (
                       <tr key={`${listing.id}-details`}>
                         <td colSpan="5" className="px-6 py-4 bg-gray-50 border-t border-gray-100">
-                          <div className="space-y-3">
-                            {listing.address && (
-                              <div className="text-sm">
-                                <span className="font-semibold text-gray-700">Address:</span>
-                                <span className="text-gray-600"> {listing.address}</span>
-                              </div>
-                            )}
-
-                            <div className="flex flex-wrap gap-6 text-sm">
-                              <div>
-                                <span className="font-semibold text-gray-700">Pets Allowed:</span>
-                                {listing.cats_allowed && listing.dogs_allowed && <span className="ml-2">Cats & Dogs</span>}
-                                {listing.cats_allowed && !listing.dogs_allowed && <span className="ml-2">Cats</span>}
-                                {!listing.cats_allowed && listing.dogs_allowed && <span className="ml-2">Dogs</span>}
-                                {!listing.cats_allowed && !listing.dogs_allowed && <span className="ml-2">None</span>}
-                              </div>
-                              {listing.laundry_type && (
-                                <div>
-                                  <span className="font-semibold text-gray-700">Laundry:</span>
-                                  <span className="text-gray-600 capitalize"> {listing.laundry_type.replace("_", " ")}</span>
+                          {detailIds.has(listing.id) ? (
+                            <div className="space-y-3">
+                              {listing.address && (
+                                <div className="text-sm">
+                                  <span className="font-semibold text-gray-700">Address:</span>
+                                  <span className="text-gray-600"> {listing.address}</span>
                                 </div>
                               )}
 
-                              {listing.parking && (
+                              <div className="flex flex-wrap gap-6 text-sm">
                                 <div>
-                                  <span className="font-semibold text-gray-700">Parking:</span>
-                                  <span className="text-gray-600 capitalize"> {listing.parking.replace("_", " ")}</span>
+                                  <span className="font-semibold text-gray-700">Pets Allowed:</span>
+                                  {listing.cats_allowed && listing.dogs_allowed && <span className="ml-2">Cats & Dogs</span>}
+                                  {listing.cats_allowed && !listing.dogs_allowed && <span className="ml-2">Cats</span>}
+                                  {!listing.cats_allowed && listing.dogs_allowed && <span className="ml-2">Dogs</span>}
+                                  {!listing.cats_allowed && !listing.dogs_allowed && <span className="ml-2">None</span>}
                                 </div>
-                              )}
-                            </div>
+                                {listing.laundry_type && (
+                                  <div>
+                                    <span className="font-semibold text-gray-700">Laundry:</span>
+                                    <span className="text-gray-600 capitalize"> {listing.laundry_type.replace("_", " ")}</span>
+                                  </div>
+                                )}
 
-                            {listing.extra_amenities && (
-                              <div className="text-sm">
-                                <span className="font-semibold text-gray-700">Amenities:</span>
-                                <span className="text-gray-600"> {listing.extra_amenities}</span>
+                                {listing.parking && (
+                                  <div>
+                                    <span className="font-semibold text-gray-700">Parking:</span>
+                                    <span className="text-gray-600 capitalize"> {listing.parking.replace("_", " ")}</span>
+                                  </div>
+                                )}
                               </div>
-                            )}
 
-                            {listing.data_quality && (
-                              <div className="text-xs text-gray-500 pt-2 border-t border-gray-200">Data Quality Score: {listing.data_quality}</div>
-                            )}
-                          </div>
+                              {listing.extra_amenities && (
+                                <div className="text-sm">
+                                  <span className="font-semibold text-gray-700">Amenities:</span>
+                                  <span className="text-gray-600"> {listing.extra_amenities}</span>
+                                </div>
+                              )}
+
+                              {listing.data_quality && (
+                                <div className="text-xs text-gray-500 pt-2 border-t border-gray-200">Data Quality Score: {listing.data_quality}</div>
+                              )}
+                            </div>
+                          ) : (
+                            <div className="text-sm text-gray-500">Loading details...</div>
+                          )}
                         </td>
                       </tr>
                     )}
@@ -336,6 +391,18 @@ function ListingTable() {
             </table>
           )}
         </div>
+
+        {nextUrl && (
+          <div ref={sentinelRef} className="text-center py-6">
+            <button
+              onClick={fetchMore}
+              className="px-4 py-2 text-sm text-blue-600 hover:text-blue-800 font-medium disabled:opacity-50"
+              disabled={loadingMore}
+            >
+              {loadingMore ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
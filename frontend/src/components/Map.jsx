@@ -32,13 +32,20 @@ export default function Map() {
 
   const fetchListings = async () => {
     try {
-      const response = await api.get("/listings/", {
+      // the map wants every pin, so walk the cursor pages in big chunks
+      let response = await api.get("/listings/", {
         params: {
           active: true,
           latitude__isnull: false,
+          page_size: 500,
         },
       });
-      setListings(response.data);
+      let results = response.data.results;
+      while (response.data.next) {
+        response = await api.get(response.data.next);
+        results = results.concat(response.data.results);
+      }
+      setListings(results);
     } catch (err) {
       console.error("Error fetching listings:", err);
       setError(err.message);